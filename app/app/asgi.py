@@ -2,15 +2,42 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The API reads are served with async views, see core.async_views, and
+streaming responses are read off the event loop, see core.asgi.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
+import logging
 import os
+import threading
 
-from django.core.asgi import get_asgi_application
+from django.db import DatabaseError
+
+from core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ASYNC_READS', '1')
 
 application = get_asgi_application()
+
+# Fill the connection pool before the first request. uvicorn imports the
+# app in each worker process, from its event loop, where the database
+# cannot be used, hence the thread.
+from core.db.base import prewarm_connections  # noqa: E402
+
+
+def prewarm():
+    try:
+        prewarm_connections()
+    except DatabaseError:
+        logging.getLogger(__name__).warning(
+            'Could not open database connections ahead of requests.',
+            exc_info=True,
+        )
+
+
+thread = threading.Thread(target=prewarm)
+thread.start()
+thread.join()
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.request_metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,17 +86,92 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
+#
+# core.db is the PostgreSQL backend with connection health checks and a
+# per-process connection pool. Connections are checked before being
+# reused. DB_POOL_SIZE bounds the connections of each process, which go
+# back to the pool after each request, and DB_POOL_MIN are opened when a
+# worker starts. 0 turns pooling off, and connections are then kept open
+# between requests for DB_CONN_MAX_AGE seconds (unlimited if empty).
+
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE else None,
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
+        'POOL': {
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', 4)),
+            'MIN': int(os.environ.get('DB_POOL_MIN', 1)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+}
+
+# Read replicas, as a comma separated list of hosts. Safe requests of the
+# API views read from them, see core.replicas. In tests they mirror the
+# default database.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOST', '').split(',')), 1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get(
+            'DB_REPLICA_PASS', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write, and an
+# optional cache alias to share this between processes.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE_ALIAS = os.environ.get('REPLICA_PIN_CACHE_ALIAS') or None
+
+# Time requests, their queries and serializers, see core.metrics.
+REQUEST_METRICS = bool(int(os.environ.get('REQUEST_METRICS', 1)))
+# Bearer token with which Prometheus scrapes the metrics endpoint, which
+# is otherwise only served to staff users.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Serve the API reads with async views, on by default under ASGI, and the
+# number of threads their database work shares, see core.async_views.
+ASYNC_READS = bool(int(os.environ.get('ASYNC_READS', 0)))
+ASYNC_DB_THREADS = int(os.environ.get(
+    'ASYNC_DB_THREADS', DATABASES['default']['POOL']['SIZE'] or 4))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# The API response cache must be shared by all the uWSGI workers, otherwise
+# a worker would keep serving responses invalidated by another one. It is
+# therefore off (dummy backend) unless a shared backend is configured, e.g.
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.dummy.DummyCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -147,8 +224,37 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'user.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.fastjson.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.fastjson.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# JSON library of the API renderer and parser: "auto" uses orjson when it
+# is installed, "orjson" requires it and "stdlib" uses the json module,
+# see core.fastjson.
+API_JSON_BACKEND = os.environ.get('API_JSON_BACKEND', 'auto')
+
+# Token -> user lookups cached by CachedTokenAuthentication: entries per
+# process, seconds an entry is kept, and an optional shared cache alias,
+# through which changes to users apply to every process at once.
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60))
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS') or None
+
+# Default and maximum number of items in a page, for clients that opt in
+# to pagination with the `cursor` or `page_size` query parameters.
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
\ No newline at end of file
@@ -7,10 +7,24 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Open the database connections before the first request. uWSGI loads the
+# app in each worker (lazy-apps), so every worker gets its own.
+from core.db.base import prewarm_connections  # noqa: E402
+
+try:
+    prewarm_connections()
+except DatabaseError:
+    logging.getLogger(__name__).warning(
+        'Could not open database connections ahead of requests.',
+        exc_info=True,
+    )
@@ -0,0 +1,63 @@
+"""
+ASGI handler reading streaming responses on a thread.
+
+Django 3.2 iterates a streaming response on the event loop. Generators
+using the database, like the recipe export, then raise
+SynchronousOnlyOperation once the status has already been sent, and the
+client gets a truncated body. This handler reads each part on the
+thread that runs the sync views and closes the response, so the
+generator keeps the connection of its request between parts.
+"""
+from asgiref.sync import sync_to_async
+
+import django
+from django.core.handlers import asgi
+
+_END = object()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """ASGIHandler iterating streaming responses off the event loop."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip(),
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(parts, _END)
+            if part is _END:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """Return the ASGI application, like django.core.asgi's."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,91 @@
+"""
+Async read views for ASGI deployments.
+
+Django 3.2 runs a sync view under ASGI on a thread of its own per
+request, which holds a database connection for as long as the request
+waits on the database. With ASYNC_READS on (the default of app.asgi),
+viewsets using AsyncReadMixin serve their read actions with an async
+view instead: the request waits on the event loop, and only its
+database work, authentication and queries included, runs on a thread of
+a bounded pool shared by all requests (ASYNC_DB_THREADS threads, see
+database_sync_to_async). Slow clients, and requests queued behind slow
+queries, then cost coroutines rather than threads and connections. The
+ORM of Django 3.2 is synchronous, hence the threads.
+
+Other methods keep the sync view, run as Django would.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import classonlymethod
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the pool of threads running database work."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.ASYNC_DB_THREADS, thread_name_prefix='async-db')
+        return _executor
+
+
+def database_sync_to_async(func):
+    """Make a sync function using the database awaitable, running it on
+    the shared database threads."""
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Back to the pool, so that the threads do not hold more
+            # connections than it allows.
+            connections.close_all()
+
+    return sync_to_async(run, thread_sensitive=False, executor=get_executor())
+
+
+class AsyncReadMixin:
+    """Viewset mixin serving the read actions with an async view when
+    ASYNC_READS is on."""
+    async_actions = ('list', 'retrieve')
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        read_methods = {
+            method for method, action in view.actions.items()
+            if action in cls.async_actions
+        }
+        if not settings.ASYNC_READS or not read_methods:
+            return view
+        if 'get' in read_methods:
+            read_methods.add('head')
+
+        def read(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                # On this thread rather than on one of Django's.
+                response.render()
+            return response
+
+        read = database_sync_to_async(read)
+        other = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            if request.method.lower() in read_methods:
+                return await read(request, *args, **kwargs)
+            return await other(request, *args, **kwargs)
+
+        # Keeps cls, actions and csrf_exempt, which the router and the
+        # schema generation read.
+        return functools.update_wrapper(async_view, view)
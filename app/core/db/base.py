@@ -0,0 +1,113 @@
+"""
+PostgreSQL backend with connection health checks and pooling.
+
+It is configured with extra keys of the database settings:
+
+- CONN_HEALTH_CHECKS: before the first query of a request, check that a
+  persistent connection still works and reconnect if not, instead of
+  failing that request (the setting of the same name in Django 4.1).
+- POOL: {'SIZE': ..., 'MIN': ..., 'TIMEOUT': ...} to pool connections
+  per process, see core.db.pool. MIN connections are opened by
+  prewarm_connections. A pooled connection goes back to the pool when
+  a request finishes, whatever CONN_MAX_AGE, so that idle threads do
+  not keep it from the others, and when its thread exits.
+"""
+from django.db import connections
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import (
+    DatabaseCreation as PostgresDatabaseCreation,
+)
+
+from core.db import pool as pools
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use.
+        pools.close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self._release = None
+
+    def _count(self, event):
+        pools.stats[f'{self.alias}:{event}'] += 1
+
+    def _get_pool(self, conn_params):
+        """Return the pool to use, or None if pooling is off."""
+        settings = self.settings_dict.get('POOL') or {}
+        if not settings.get('SIZE'):
+            return None
+        return pools.get_pool(
+            self.alias, conn_params, settings['SIZE'],
+            settings.get('TIMEOUT', 10),
+        )
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        pool = self._get_pool(conn_params)
+        if pool is None:
+            self._count('connects')
+            return connect(conn_params)
+
+        check = pools.ping if self.settings_dict.get('CONN_HEALTH_CHECKS') \
+            else None
+        connection = pool.acquire(lambda: connect(conn_params), check)
+        self._release = pools.hold(pool, connection)
+        return connection
+
+    def _close(self):
+        if self._release is None:
+            return super()._close()
+
+        release, self._release = self._release, None
+        if self.in_atomic_block:
+            # Django keeps the connection of a transaction until the
+            # transaction ends, so it cannot be handed out again.
+            super()._close()
+        release()
+
+    def close_if_unusable_or_obsolete(self):
+        # Runs when a request starts and finishes.
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+        if self._release is not None and not self.in_atomic_block:
+            self.close()
+
+    def _cursor(self, name=None):
+        # Checked on the first query rather than in ensure_connection,
+        # which also runs to read the autocommit state between requests.
+        if not self.health_check_done:
+            if self.connection is not None:
+                self._count('persistent_reuses')
+                if self.settings_dict.get('CONN_HEALTH_CHECKS') and \
+                        not self.in_atomic_block and not self.is_usable():
+                    self._count('health_check_failures')
+                    self.close()
+            self.health_check_done = True
+        return super()._cursor(name)
+
+    def prewarm(self):
+        """Open connections ahead of the first request."""
+        params = self.get_connection_params()
+        pool = self._get_pool(params)
+        if pool is not None:
+            connect = super().get_new_connection
+            pool.prewarm(self.settings_dict['POOL'].get('MIN', 0),
+                         lambda: connect(params))
+        elif self.settings_dict['CONN_MAX_AGE'] != 0:
+            self.ensure_connection()
+
+
+def prewarm_connections():
+    """Open connections to every database using this backend."""
+    for connection in connections.all():
+        if isinstance(connection, DatabaseWrapper):
+            connection.prewarm()
@@ -0,0 +1,194 @@
+"""
+Per-process pool of PostgreSQL connections.
+
+Django opens one connection per thread and alias. With the core.db
+backend, closing that connection hands it back to a pool instead, and
+opening one takes an idle connection from the pool when there is one,
+so requests and threads reuse connections without a new handshake. The
+pool also bounds how many connections a process opens: once SIZE are in
+use, opening another waits up to TIMEOUT seconds for one to be returned.
+
+A connection a thread still holds when it exits goes back to the pool
+too (see hold), as threaded servers start and end threads of their own.
+
+Pools are per process (uWSGI workers must load the app after forking,
+with lazy-apps) and per connection parameters, so a test database gets
+its own.
+"""
+from collections import Counter, deque
+import os
+import threading
+import weakref
+
+import psycopg2
+from psycopg2 import extensions
+
+# Counts of connection events in this process, by 'alias:event'.
+stats = Counter()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Tokens of the connections held by each thread, freed with the thread.
+_held = threading.local()
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except psycopg2.Error:
+        pass
+
+
+def ping(connection):
+    """Return whether a connection still works."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if connection.info.transaction_status != \
+                extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of connections to one database."""
+
+    def __init__(self, alias, size, timeout):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        # Most recently returned first, so the rest can go stale and be
+        # weeded out by health checks rather than all being kept warm.
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _count(self, event):
+        stats[f'{self.alias}:{event}'] += 1
+
+    @property
+    def idle(self):
+        """Number of idle connections."""
+        return len(self._idle)
+
+    def acquire(self, connect, check=None):
+        """Return an idle connection passing the check, or a new one."""
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count('timeouts')
+            raise psycopg2.OperationalError(
+                f'No connection to {self.alias} available within '
+                f'{self.timeout} seconds, the pool of {self.size} is in use.'
+            )
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    break
+                if connection.closed or (check and not check(connection)):
+                    self._count('health_check_failures')
+                    _close_quietly(connection)
+                    continue
+                self._count('reuses')
+                return connection
+
+            connection = connect()
+            self._count('connects')
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Take back a connection, discarding it if it is broken."""
+        try:
+            if not connection.closed and connection.info.transaction_status \
+                    != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            _close_quietly(connection)
+        if connection.closed:
+            self._count('discards')
+        else:
+            with self._lock:
+                self._idle.append(connection)
+        self._slots.release()
+
+    def prewarm(self, count, connect):
+        """Open connections until count are idle."""
+        count = min(count, self.size) - self.idle
+        connections = [self.acquire(connect) for _ in range(max(count, 0))]
+        for connection in connections:
+            self.release(connection)
+
+    def close(self):
+        """Close the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection in idle:
+            _close_quietly(connection)
+
+
+class _Token:
+    """Kept by the thread holding a pooled connection."""
+
+
+def hold(pool, connection):
+    """Release a connection to its pool once the current thread exits,
+    and return a function releasing it sooner.
+
+    The thread keeps a token in a thread local, freed when it exits, and
+    the token's finalizer releases the connection. Nothing else refers
+    to the token, so that neither the thread's DatabaseWrapper nor the
+    returned function keeps it alive.
+    """
+    token = _Token()
+    _held.__dict__.setdefault('tokens', set()).add(token)
+    finalizer = weakref.finalize(token, pool.release, connection)
+    finalizer.atexit = False
+    token_ref = weakref.ref(token)
+
+    def release():
+        token = token_ref()
+        if token is not None:
+            getattr(_held, 'tokens', set()).discard(token)
+        # Releases once, unless the thread already did on exiting.
+        finalizer()
+
+    return release
+
+
+def get_pool(alias, params, size, timeout):
+    """Return the pool of this process for an alias and its connection
+    parameters."""
+    key = (os.getpid(), alias, tuple(sorted(
+        (name, str(value)) for name, value in params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(alias, size, timeout)
+        return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process."""
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items()
+                 if key[0] == os.getpid()]
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Return the connection counters and pool sizes of this process."""
+    result = dict(stats)
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items()
+                 if key[0] == os.getpid()]
+    for pool in pools:
+        result[f'{pool.alias}:idle'] = \
+            result.get(f'{pool.alias}:idle', 0) + pool.idle
+    return result
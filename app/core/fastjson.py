@@ -0,0 +1,106 @@
+"""
+JSON renderer and parser backed by orjson, when it is installed.
+
+settings.API_JSON_BACKEND selects the library: "auto" uses orjson when
+it can be imported, "orjson" requires it and "stdlib" keeps DRF's
+renderer and parser on the json module. Subclasses may set their own
+backend instead.
+
+The output is the same as DRF's JSONRenderer: compact, UTF-8, with
+U+2028 and U+2029 escaped. orjson writes strings, numbers, lists, dicts
+and UUIDs itself. Dates, times and datetimes are passed to DRF's
+JSONEncoder, as are Decimals and the other types it knows, so that
+they are formatted as before. Whatever orjson cannot write, such as
+integers over 64 bits or non-string keys, and requests for indented or
+ASCII output, are rendered by DRF's renderer. Likewise, bodies orjson
+rejects, or with runs of 19 digits or more, are parsed by DRF's parser,
+which accepts what the json module accepts and raises the same errors.
+
+Two differences remain. NaN and infinite floats are written as null
+instead of being refused. Floats in exponent notation are written in
+orjson's shortest form, e.g. 1e16 and 1.5e-7 where the json module
+writes 1e+16 and 1.5e-07; they are read back as the same numbers.
+"""
+import io
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework import parsers, renderers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKENDS = ['auto', 'orjson', 'stdlib']
+
+# Numbers orjson may not read as integers, since it turns integers over
+# 64 bits into floats. Bodies are searched for them with their digits
+# translated to 0 and the other bytes to spaces, as a substring search
+# is an order of magnitude faster than a regular expression.
+_LONG_NUMBER = b'0' * 19
+_DIGITS = bytes(
+    ord('0') if byte in b'0123456789' else ord(' ') for byte in range(256))
+
+
+def use_orjson(backend=None):
+    """Return whether JSON goes through orjson with a backend, by default
+    API_JSON_BACKEND."""
+    backend = backend or settings.API_JSON_BACKEND
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'API_JSON_BACKEND must be one of {", ".join(BACKENDS)}.')
+    if backend == 'orjson' and orjson is None:
+        raise ImproperlyConfigured(
+            'API_JSON_BACKEND is "orjson" but orjson is not installed.')
+    return backend != 'stdlib' and orjson is not None
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer writing through orjson when enabled."""
+    # One of BACKENDS, or None for API_JSON_BACKEND.
+    backend = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not use_orjson(self.backend) or \
+                not self.compact or self.ensure_ascii or \
+                self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+        # Like DRF, escape the line separators JavaScript does not allow
+        # in strings.
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028')\
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class JSONParser(parsers.JSONParser):
+    """JSONParser reading through orjson when enabled."""
+    # One of BACKENDS, or None for API_JSON_BACKEND.
+    backend = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET)
+        if not use_orjson(self.backend) or \
+                encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if _LONG_NUMBER not in body.translate(_DIGITS):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,210 @@
+"""
+Helpers shared by the benchmark commands.
+"""
+from contextlib import contextmanager
+import io
+import statistics
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag, Ingredient
+
+
+def measure(queryset, repeat):
+    """Return the plan cost and latency of evaluating a queryset."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(list(queryset.all()))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'plan_cost': plan[0]['Plan']['Total Cost'],
+        'rows': rows,
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def median_ms(func, repeat):
+    """Return the median time of calling func, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def percentile(timings, percent):
+    """Return the given percentile of sorted timings."""
+    index = min(len(timings) - 1, round(percent / 100 * len(timings)))
+    return timings[index]
+
+
+def create_user():
+    """Create the user the data of a benchmark belongs to."""
+    return get_user_model().objects.create_user(
+        email='benchmark@example.com',
+        password='benchmark',
+    )
+
+
+@contextmanager
+def rolled_back_user():
+    """Yield a new user in a transaction that is rolled back at the end,
+    so that the data seeded for it never outlives the benchmark."""
+    with transaction.atomic():
+        try:
+            yield create_user()
+        finally:
+            transaction.set_rollback(True)
+
+
+def analyze(*models):
+    """Give the planner statistics for freshly seeded tables."""
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+def seed_recipes(user, count, per_recipe=3, tags=10, ingredients=10,
+                 rng=None):
+    """Insert recipes for a user, each linked to per_recipe of its first
+    tags and ingredients, which are created the first time. The items
+    linked are taken in turn, or at random with rng, a random.Random.
+    Returns the tags and ingredients."""
+    items = {}
+    for model, total in [(Tag, tags), (Ingredient, ingredients)]:
+        model.objects.bulk_create(
+            [model(user=user, name=f'{model.__name__} {i}')
+             for i in range(total)],
+            ignore_conflicts=True,
+        )
+        items[model] = list(
+            model.objects.filter(user=user).order_by('id')[:total])
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=10,
+               price='5.25', link='https://example.com/recipe')
+        for i in range(count)
+    )
+
+    def linked(choices):
+        """Yield each recipe with the items it is linked to."""
+        size = min(per_recipe, len(choices))
+        for i, recipe in enumerate(recipes):
+            if rng is None:
+                picked = [choices[(i + j) % len(choices)]
+                          for j in range(size)]
+            else:
+                picked = rng.sample(choices, size)
+            for item in picked:
+                yield recipe, item
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe, tag in linked(items[Tag])
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe.id, ingredient_id=ingredient.id)
+        for recipe, ingredient in linked(items[Ingredient])
+    )
+    return items[Tag], items[Ingredient]
+
+
+@contextmanager
+def api_user(recipes=20):
+    """Commit a user with a token and recipes for the duration of a load
+    test, so that every thread and server can see them, and yield the
+    token."""
+    user = create_user()
+    try:
+        token = Token.objects.create(user=user)
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=10,
+                   price='5.00')
+            for i in range(recipes)
+        )
+        yield token.key
+    finally:
+        user.delete()
+
+
+def wsgi_request(handler, method, path, token, body=b'', content_type=''):
+    """Send a request through a WSGI handler like uWSGI does, and return
+    its status code, headers and latency in milliseconds."""
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_AUTHORIZATION': f'Token {token}',
+        'HTTP_HOST': next(
+            (host for host in settings.ALLOWED_HOSTS
+             if not host.startswith('.') and host != '*'),
+            'localhost',
+        ),
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    setup_testing_defaults(environ)
+    started = {}
+
+    def start_response(status, headers):
+        started['status'] = int(status.split()[0])
+        started['headers'] = dict(headers)
+
+    start = time.perf_counter()
+    response = handler(environ, start_response)
+    b''.join(response)
+    # Sends request_finished, which closes or keeps the connection.
+    response.close()
+    latency = (time.perf_counter() - start) * 1000
+    return started['status'], started['headers'], latency
+
+
+def http_request(base_url, method, path, token, body=b'', content_type=''):
+    """Send a request to a server over a new HTTP connection, and return
+    its status code, headers and latency in milliseconds."""
+    request = Request(
+        base_url.rstrip('/') + path,
+        data=body if method != 'GET' else None,
+        method=method,
+        headers={'Authorization': f'Token {token}',
+                 **({'Content-Type': content_type} if content_type else {})},
+    )
+    start = time.perf_counter()
+    try:
+        with urlopen(request) as response:
+            response.read()
+            status, headers = response.status, response.headers
+    except HTTPError as error:
+        error.read()
+        status, headers = error.code, error.headers
+    latency = (time.perf_counter() - start) * 1000
+    return status, dict(headers), latency
+
+
+def close_thread_connections(executor, threads):
+    """Close the connections kept by the threads of an executor, waiting
+    for each other so that every thread closes its own."""
+    barrier = threading.Barrier(threads)
+    list(executor.map(
+        lambda _: (barrier.wait(), connections.close_all()),
+        range(threads),
+    ))
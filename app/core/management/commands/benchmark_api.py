@@ -0,0 +1,260 @@
+"""
+Django command to load test the recipe API on seeded data.
+
+Run seed_data first, then e.g.:
+
+    docker-compose run --rm app sh -c "python manage.py seed_data &&
+        python manage.py benchmark_api --output bench.json"
+
+Each scenario runs in turn: listing, retrieving, filtering and creating
+recipes, and uploading images, from --concurrency threads. Each request
+is made as one of the seeded users, in turn. The throughput, latency
+percentiles and queries per request of each scenario are reported as
+JSON, the queries being counted by the request metrics (REQUEST_METRICS)
+from the Server-Timing header.
+
+With --url, requests are sent over HTTP to a deployment, e.g. the proxy
+at http://localhost:8000, which must use the database of this command.
+Otherwise they go through the WSGI application in this process, like
+uWSGI sends them: the threads then share one interpreter and its lock,
+and neither nginx nor uWSGI are measured, so the numbers only compare
+runs of the application code, not the capacity of a deployment.
+
+With --compare, the results are compared with those of an earlier run
+saved with --output, and the command fails if a scenario makes more
+queries per request, as query counts do not depend on the machine.
+Latencies are compared for information only.
+
+The recipes, tags and ingredients created, the recipes images are
+uploaded to and the image files stored for them are deleted at the end.
+With --url, the files are deleted from the MEDIA_ROOT of this command,
+which should be the volume of the deployment.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import io
+import itertools
+import json
+import random
+import re
+import statistics
+import time
+
+from PIL import Image
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.management.benchmark import (
+    close_thread_connections,
+    http_request,
+    percentile,
+    wsgi_request,
+)
+from core.management.commands.seed_data import seeded_users
+from core.models import ImageJob, Recipe, Tag, Ingredient
+from recipe.images import delete_unused_files
+
+SCENARIOS = ['list', 'detail', 'filter', 'create', 'upload']
+CREATED_TITLE = 'Benchmark recipe'
+CREATED_NAME = 'benchmark'
+QUERIES = re.compile(r'desc="(\d+) quer')
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe API."""
+    help = 'Load test the recipe API endpoints on the seeded data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--users', type=int, default=10,
+                            help='Seeded users to make the requests as.')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help='Comma separated scenarios to run.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--url',
+            help='Base URL of a deployment to send the requests to, '
+                 'instead of the application in this process.')
+        parser.add_argument('--output',
+                            help='File to save the results to.')
+        parser.add_argument('--compare',
+                            help='Results of an earlier run to compare.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(unknown)}.')
+        users = list(seeded_users().order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('No seeded users, run seed_data first.')
+
+        self._rng = random.Random(options['seed'])
+        if options['url']:
+            self._send = partial(http_request, options['url'])
+        else:
+            self._send = partial(wsgi_request, WSGIHandler())
+        self._accounts = [self._account(user) for user in users]
+        # Leave the pool to the threads.
+        connections.close_all()
+        try:
+            results = {
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'scenarios': {
+                    scenario: self._run(scenario, options)
+                    for scenario in scenarios
+                },
+            }
+        finally:
+            self._clean_up(users)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+        self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                self._compare(json.load(baseline_file), results)
+
+    def _clean_up(self, users):
+        """Delete the data created, and the files no recipe uses then."""
+        created = Recipe.objects.filter(user__in=users, title=CREATED_TITLE)
+        names = list(ImageJob.objects.filter(
+            recipe__in=created).values_list('source', flat=True))
+        for image, renditions in created.values_list(
+                'image', 'image_renditions'):
+            names.append(image)
+            names.extend(name for formats in renditions.values()
+                         for name in formats.values())
+        created.delete()
+        for model in [Tag, Ingredient]:
+            model.objects.filter(user__in=users, name=CREATED_NAME).delete()
+        delete_unused_files(names)
+
+    def _account(self, user):
+        """Return what the requests of a seeded user need."""
+        token, _ = Token.objects.get_or_create(user=user)
+        upload_target = Recipe.objects.create(
+            user=user, title=CREATED_TITLE, time_minutes=1, price='1.00')
+        return {
+            'token': token.key,
+            'recipes': list(Recipe.objects.filter(user=user).exclude(
+                title=CREATED_TITLE).values_list('id', flat=True)[:100]),
+            'tags': list(Tag.objects.filter(user=user).values_list(
+                'id', flat=True)[:100]),
+            'ingredients': list(Ingredient.objects.filter(
+                user=user).values_list('id', flat=True)[:100]),
+            'upload_target': upload_target.id,
+        }
+
+    def _run(self, scenario, options):
+        """Run the requests of a scenario."""
+        self.stdout.write(f'Running {scenario}...')
+        accounts = itertools.cycle(self._accounts)
+        requests = [
+            getattr(self, f'_{scenario}_request')(next(accounts))
+            for _ in range(options['requests'])
+        ]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            responses = list(executor.map(
+                lambda request: self._send(*request),
+                requests,
+            ))
+            close_thread_connections(executor, options['concurrency'])
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(latency for _, _, latency in responses)
+        errors = sum(status >= 400 for status, _, _ in responses)
+        queries = [
+            int(match.group(1))
+            for _, headers, _ in responses
+            for match in [QUERIES.search(headers.get('Server-Timing', ''))]
+            if match
+        ]
+        return {
+            'requests_per_second': round(len(responses) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries_per_request': (
+                round(statistics.mean(queries), 2) if queries else None),
+            'max_queries': max(queries, default=None),
+            'errors': errors,
+        }
+
+    def _list_request(self, account):
+        return 'GET', reverse('recipe:recipe-list'), account['token']
+
+    def _detail_request(self, account):
+        recipe_id = self._rng.choice(account['recipes'])
+        url = reverse('recipe:recipe-detail', args=[recipe_id])
+        return 'GET', url, account['token']
+
+    def _filter_request(self, account):
+        tags = self._rng.sample(account['tags'], min(2, len(account['tags'])))
+        ingredients = account['ingredients'][:1]
+        url = (
+            f'{reverse("recipe:recipe-list")}'
+            f'?tags={",".join(map(str, tags))}'
+            f'&ingredients={",".join(map(str, ingredients))}'
+        )
+        return 'GET', url, account['token']
+
+    def _create_request(self, account):
+        body = json.dumps({
+            'title': CREATED_TITLE,
+            'time_minutes': 30,
+            'price': '12.50',
+            'tags': [{'name': CREATED_NAME}],
+            'ingredients': [{'name': CREATED_NAME}],
+        }).encode()
+        return ('POST', reverse('recipe:recipe-list'), account['token'],
+                body, 'application/json')
+
+    def _upload_request(self, account):
+        url = reverse('recipe:recipe-upload-image',
+                      args=[account['upload_target']])
+        body = encode_multipart(BOUNDARY, {'image': self._image()})
+        return 'POST', url, account['token'], body, MULTIPART_CONTENT
+
+    def _image(self):
+        """Return a small JPEG file."""
+        image_file = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(image_file, format='JPEG')
+        image_file.seek(0)
+        image_file.name = 'benchmark.jpg'
+        return image_file
+
+    def _compare(self, baseline, results):
+        """Write the changes from a baseline and fail on more queries."""
+        regressions = []
+        for scenario, result in results['scenarios'].items():
+            before = baseline['scenarios'].get(scenario)
+            if before is None:
+                continue
+            changes = ', '.join(
+                f'{key} {before[key]} -> {result[key]}'
+                for key in ['requests_per_second', 'p50_ms', 'p95_ms',
+                            'p99_ms', 'queries_per_request']
+            )
+            self.stdout.write(f'{scenario}: {changes}')
+            if (result['queries_per_request'] or 0) > \
+                    (before['queries_per_request'] or 0):
+                regressions.append(scenario)
+
+        if regressions:
+            raise CommandError(
+                f'More queries per request in: {", ".join(regressions)}.')
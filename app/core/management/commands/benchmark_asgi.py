@@ -0,0 +1,171 @@
+"""
+Django command to load test the API served by uWSGI and by uvicorn.
+
+Each server is started as run.sh would, with the same number of worker
+processes, against the database of this command, and hammered by many
+concurrent clients, each making one request after another over a new
+connection. Under uWSGI a worker serves one request at a time; under
+uvicorn the read views are async (see core.async_views). The throughput
+and latency percentiles of each server are reported.
+"""
+import asyncio
+from contextlib import contextmanager
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from core.management.benchmark import api_user, percentile
+
+SERVERS = ['uwsgi', 'asgi']
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the WSGI and ASGI deployments."""
+    help = 'Compare API throughput under uWSGI and uvicorn.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--port', type=int, default=9100)
+        parser.add_argument('--servers', default=','.join(SERVERS),
+                            help='Comma separated servers to run.')
+        parser.add_argument('--path', default=reverse('recipe:recipe-list'),
+                            help='API path to request.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        servers = options['servers'].split(',')
+        for server in servers:
+            if server not in SERVERS:
+                raise CommandError(f'Unknown server {server}.')
+        if 'uwsgi' in servers and not shutil.which('uwsgi'):
+            raise CommandError('uwsgi is not installed.')
+
+        results = {}
+        with api_user() as token:
+            for server in servers:
+                self.stdout.write(f'Running {server}...')
+                with self._server(server, options):
+                    results[server] = asyncio.run(self._load(token, options))
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _environ(self):
+        """Return the environment of a server, using this database."""
+        database = connection.settings_dict
+        return {
+            **os.environ,
+            'DB_HOST': database['HOST'] or '',
+            'DB_NAME': database['NAME'],
+            'DB_USER': database['USER'] or '',
+            'DB_PASS': database['PASSWORD'] or '',
+            'ALLOWED_HOSTS': '127.0.0.1',
+        }
+
+    def _command(self, server, options):
+        port, workers = str(options['port']), str(options['workers'])
+        if server == 'uwsgi':
+            return [
+                'uwsgi', '--http-socket', f'127.0.0.1:{port}',
+                '--workers', workers, '--master', '--enable-threads',
+                '--lazy-apps', '--module', 'app.wsgi', '--listen', '1024',
+                '--die-on-term', '--disable-logging',
+            ]
+        return [
+            sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+            '--host', '127.0.0.1', '--port', port, '--workers', workers,
+            '--no-access-log',
+        ]
+
+    @contextmanager
+    def _server(self, server, options):
+        """Run a server until the block exits."""
+        process = subprocess.Popen(
+            self._command(server, options),
+            cwd=settings.BASE_DIR,
+            env=self._environ(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self._wait_until_listening(process, options['port'])
+            yield
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def _wait_until_listening(self, process, port, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('The server exited on start.')
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise CommandError(f'The server did not listen within {timeout}s.')
+
+    async def _load(self, token, options):
+        """Make the requests from concurrent clients."""
+        request = (
+            f'GET {options["path"]} HTTP/1.1\r\n'
+            f'Host: 127.0.0.1\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode()
+        remaining = options['requests']
+        timings, errors = [], 0
+
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                if await self._request(options['port'], request):
+                    timings.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['clients'])))
+        elapsed = time.perf_counter() - start
+        if not timings:
+            raise CommandError('Every request failed.')
+
+        timings.sort()
+        return {
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'max_ms': round(timings[-1], 3),
+            'errors': errors,
+        }
+
+    async def _request(self, port, request):
+        """Return whether a request succeeded."""
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                writer.write(request)
+                status = await asyncio.wait_for(reader.readline(), 60)
+                await asyncio.wait_for(reader.read(), 60)
+            finally:
+                writer.close()
+        except (OSError, asyncio.TimeoutError):
+            return False
+        return status.split()[1:2] == [b'200']
@@ -0,0 +1,75 @@
+"""
+Django command to benchmark tag and ingredient autocomplete.
+
+Seeds growing numbers of ingredients for a rolled back user, and
+measures the latency of the prefix and fuzzy autocomplete queries the
+API runs at each size.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.management.benchmark import analyze, measure, rolled_back_user
+from core.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to benchmark autocomplete."""
+    help = 'Measure autocomplete latency as the vocabulary grows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,100000,1000000',
+            help='Comma separated numbers of ingredients to measure at.')
+        parser.add_argument('--text', default='tomat',
+                            help='Text to autocomplete.')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        results = {}
+        with rolled_back_user() as user:
+            seeded = 0
+            for size in sizes:
+                self._seed(user, seeded, size)
+                seeded = size
+                results[size] = self._cases(user, options)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _seed(self, user, start, stop):
+        """Insert ingredients start + 1 to stop, with names of random
+        letters."""
+        self.stdout.write(f'Seeding {stop} ingredients...')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT setseed(%s)', [start / (start + stop)])
+            cursor.execute(
+                f"""
+                INSERT INTO {Ingredient._meta.db_table}
+                    (user_id, name, recipe_count, updated_at)
+                SELECT %s, (
+                    SELECT string_agg(chr(97 + floor(random() * 26)::int), '')
+                    FROM generate_series(1, 6 + i %% 7)
+                ), 0, now()
+                FROM generate_series(%s, %s) AS i
+                ON CONFLICT DO NOTHING
+                """,
+                [user.id, start + 1, stop],
+            )
+        analyze(Ingredient)
+
+    def _cases(self, user, options):
+        """Return the measurements at the current size, keyed by name."""
+        ingredients = Ingredient.objects.filter(user=user)
+        text, limit = options['text'], options['limit']
+        cases = {
+            'prefix': ingredients.autocomplete(text, prefix=True)[:limit],
+            'q': ingredients.autocomplete(text)[:limit],
+        }
+        return {
+            name: measure(queryset, options['repeat'])
+            for name, queryset in cases.items()
+        }
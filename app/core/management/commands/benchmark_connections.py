@@ -0,0 +1,106 @@
+"""
+Django command to load test the API under each connection strategy.
+
+Requests go through the WSGI application like uWSGI sends them, from a
+number of threads standing in for workers, so connections are closed or
+kept at the end of each request as configured. The same requests are
+run opening a new connection per request, keeping persistent
+connections, and pooling them, and the latency percentiles and
+connection counters of each are reported.
+
+The benchmark user and recipes are committed so that every thread can
+see them, and deleted at the end.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import statistics
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+
+from core.db import pool as pools
+from core.management.benchmark import (
+    api_user,
+    close_thread_connections,
+    percentile,
+    wsgi_request,
+)
+
+MODES = {
+    'new_connection': {'CONN_MAX_AGE': 0, 'POOL': None},
+    'persistent': {'CONN_MAX_AGE': None, 'POOL': None},
+    'pooled': {'CONN_MAX_AGE': 0},
+}
+
+
+class Command(BaseCommand):
+    """Django command to benchmark database connection strategies."""
+    help = 'Compare API latency with new, persistent and pooled connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--modes', default=','.join(MODES),
+                            help='Comma separated modes to run.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with api_user() as token:
+            results = {
+                mode: self._run(mode, token, options)
+                for mode in options['modes'].split(',')
+            }
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _run(self, mode, token, options):
+        """Run the requests with the settings of a mode."""
+        self.stdout.write(f'Running {mode}...')
+        saved = {
+            alias: {key: database.get(key) for key in MODES[mode]}
+            for alias, database in connections.databases.items()
+        }
+        for database in connections.databases.values():
+            database.update(MODES[mode])
+        pools.close_pools()
+        stats_before = pools.stats.copy()
+        try:
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                timings = sorted(executor.map(
+                    lambda _: self._request(token),
+                    range(options['requests']),
+                ))
+                close_thread_connections(executor, options['concurrency'])
+        finally:
+            for alias, database in connections.databases.items():
+                database.update(saved[alias])
+            pools.close_pools()
+
+        # Of every alias, as reads may go to the replicas.
+        counters = Counter()
+        for key, count in (pools.stats - stats_before).items():
+            counters[key.split(':')[1]] += count
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'connects': counters['connects'],
+            'reuses': counters['reuses'] + counters['persistent_reuses'],
+        }
+
+    def _request(self, token):
+        """Return the latency of listing recipes, in milliseconds."""
+        status, _, latency = wsgi_request(
+            self._handler, 'GET', reverse('recipe:recipe-list'), token)
+        if status != 200:
+            raise CommandError(f'The API responded {status}.')
+        return latency
+
+    @property
+    def _handler(self):
+        if not hasattr(self, '_wsgi_handler'):
+            self._wsgi_handler = WSGIHandler()
+        return self._wsgi_handler
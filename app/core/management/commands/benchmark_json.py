@@ -0,0 +1,90 @@
+"""
+Django command to benchmark the JSON renderer and parser of the API.
+
+Seeds recipes with tags and ingredients for a rolled back user, and
+renders the payload of listing them (as
+RecipeRowSerializer builds it) with DRF's renderer and with the one of
+core.fastjson, then parses the JSON back with both parsers. The median
+times and speedups are reported for each number of recipes.
+"""
+import io
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import fastjson
+from core.management.benchmark import (
+    median_ms,
+    rolled_back_user,
+    seed_recipes,
+)
+from core.models import Recipe
+from recipe.serializers import RecipeRowSerializer
+
+
+class OrjsonRenderer(fastjson.JSONRenderer):
+    """The API renderer, on orjson whatever API_JSON_BACKEND is."""
+    backend = 'orjson'
+
+
+class OrjsonParser(fastjson.JSONParser):
+    """The API parser, on orjson whatever API_JSON_BACKEND is."""
+    backend = 'orjson'
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API JSON renderer and parser."""
+    help = 'Compare rendering and parsing recipe lists with orjson.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,1000,10000',
+            help='Comma separated numbers of recipes to measure at.')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if fastjson.orjson is None:
+            raise CommandError('orjson is not installed.')
+
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        results = {}
+        with rolled_back_user() as user:
+            seeded = 0
+            for size in sizes:
+                self.stdout.write(f'Seeding {size} recipes...')
+                seed_recipes(user, size - seeded)
+                seeded = size
+                results[size] = self._cases(user, options['repeat'])
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _cases(self, user, repeat):
+        """Measure rendering and parsing the recipes of a user."""
+        rows = RecipeRowSerializer.rows(
+            Recipe.objects.for_user(user).order_by('-id'))
+        data = RecipeRowSerializer(rows, many=True).data
+        content = JSONRenderer().render(data)
+        if OrjsonRenderer().render(data) != content:
+            raise CommandError('The renderers disagree.')
+
+        timings = {
+            'render_ms': median_ms(
+                lambda: JSONRenderer().render(data), repeat),
+            'fast_render_ms': median_ms(
+                lambda: OrjsonRenderer().render(data), repeat),
+            'parse_ms': median_ms(
+                lambda: JSONParser().parse(io.BytesIO(content)), repeat),
+            'fast_parse_ms': median_ms(
+                lambda: OrjsonParser().parse(io.BytesIO(content)), repeat),
+        }
+        results = {key: round(value, 3) for key, value in timings.items()}
+        results['bytes'] = len(content)
+        results['render_speedup'] = round(
+            timings['render_ms'] / timings['fast_render_ms'], 1)
+        results['parse_speedup'] = round(
+            timings['parse_ms'] / timings['fast_parse_ms'], 1)
+        return results
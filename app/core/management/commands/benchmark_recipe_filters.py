@@ -0,0 +1,81 @@
+"""
+Django command to benchmark the recipe tag/ingredient filters.
+
+Seeds recipes for a rolled back user, then compares the join + DISTINCT
+filter the API used to run with the EXISTS / grouped count filters of
+RecipeQuerySet, reporting the planner's estimated cost and the measured
+latency of each.
+"""
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.management.benchmark import (
+    analyze,
+    measure,
+    rolled_back_user,
+    seed_recipes,
+)
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to benchmark recipe filtering."""
+    help = 'Compare plan cost and latency of recipe tag/ingredient filters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--per-recipe', type=int, default=5,
+                            help='Tags and ingredients linked per recipe.')
+        parser.add_argument('--filter-ids', type=int, default=3,
+                            help='Number of ids passed to each filter.')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with rolled_back_user() as user:
+            tag_ids, ingredient_ids = self._seed(user, options)
+            cases = self._cases(user, tag_ids, ingredient_ids)
+            results = {
+                name: measure(queryset, options['repeat'])
+                for name, queryset in cases.items()
+            }
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _seed(self, user, options):
+        """Create recipes, tags and ingredients in bulk and return the ids
+        to filter by."""
+        self.stdout.write('Seeding benchmark data...')
+        rng = random.Random(0)
+        tags, ingredients = seed_recipes(
+            user, options['recipes'], options['per_recipe'],
+            tags=options['tags'], ingredients=options['ingredients'],
+            rng=rng,
+        )
+        analyze(Recipe, Recipe.tags.through, Recipe.ingredients.through)
+
+        count = options['filter_ids']
+        return (
+            [tag.id for tag in rng.sample(tags, count)],
+            [ingredient.id for ingredient in rng.sample(ingredients, count)],
+        )
+
+    def _cases(self, user, tag_ids, ingredient_ids):
+        """Return the querysets to compare, keyed by name."""
+        recipes = Recipe.objects.for_user(user).order_by('-id')
+        return {
+            'join_distinct': recipes
+            .filter(tags__id__in=tag_ids)
+            .filter(ingredients__id__in=ingredient_ids)
+            .distinct(),
+            'exists_any': recipes
+            .with_tags(tag_ids)
+            .with_ingredients(ingredient_ids),
+            'grouped_all': recipes
+            .with_tags(tag_ids, 'all')
+            .with_ingredients(ingredient_ids, 'all'),
+        }
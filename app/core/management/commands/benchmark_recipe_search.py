@@ -0,0 +1,88 @@
+"""
+Django command to benchmark the recipe full text search.
+
+Seeds growing numbers of recipes for a rolled back user, and measures
+the latency of fetching the first page of search results at each size,
+against an icontains scan of the same word. A word that matches a fixed
+number of recipes is searched for, so with the GIN index the latency
+should stay flat as the table grows.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.management.benchmark import analyze, measure, rolled_back_user
+from core.models import Recipe
+
+WORDS = ['tomato', 'basil', 'garlic', 'lemon', 'chicken',
+         'rice', 'pepper', 'onion', 'ginger', 'butter']
+
+
+class Command(BaseCommand):
+    """Django command to benchmark recipe search."""
+    help = 'Measure recipe search latency as the number of recipes grows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,100000,1000000',
+            help='Comma separated numbers of recipes to measure at.')
+        parser.add_argument('--matches', type=int, default=100,
+                            help='Recipes containing the searched word.')
+        parser.add_argument('--word', default='saffron')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        results = {}
+        with rolled_back_user() as user:
+            seeded = 0
+            for size in sizes:
+                self._seed(user, seeded, size, options)
+                seeded = size
+                results[size] = self._cases(user, options)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _seed(self, user, start, stop, options):
+        """Insert recipes start + 1 to stop and index them."""
+        self.stdout.write(f'Seeding {stop} recipes...')
+        words = 'ARRAY[%s]' % ', '.join(['%s'] * len(WORDS))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Recipe._meta.db_table} (
+                    user_id, title, description, time_minutes, price,
+                    link, image_status, image_renditions, updated_at
+                )
+                SELECT
+                    %s,
+                    'Recipe ' || i || ' ' || ({words})[i %% {len(WORDS)} + 1],
+                    CASE WHEN i <= %s THEN 'With a pinch of ' || %s
+                         ELSE 'Serve warm.' END,
+                    10, 5.00, '', '', '{{}}', now()
+                FROM generate_series(%s, %s) AS i
+                """,
+                [user.id, *WORDS, options['matches'], options['word'],
+                 start + 1, stop],
+            )
+        Recipe.objects.for_user(user).filter(search_vector__isnull=True)\
+            .update_search_vector()
+        analyze(Recipe)
+
+    def _cases(self, user, options):
+        """Return the measurements at the current size, keyed by name."""
+        recipes = Recipe.objects.for_user(user)
+        page_size = options['page_size']
+        word = options['word']
+        cases = {
+            'search': recipes.search(word)[:page_size],
+            'icontains': recipes.filter(description__icontains=word)
+            .order_by('-id')[:page_size],
+        }
+        return {
+            name: measure(queryset, options['repeat'])
+            for name, queryset in cases.items()
+        }
@@ -0,0 +1,82 @@
+"""
+Django command to benchmark the fast path recipe serializers.
+
+Seeds recipes with tags and ingredients for a rolled back user, and
+compares rendering them end to end, queries included, with the
+serializers (RecipeSerializer on prefetched instances) and with their
+fast path (RecipeRowSerializer on rows). The median time of each per
+1,000 recipes is reported, with the speedup and whether both render the
+same JSON.
+
+The fast path is meant to be at least 3 times faster, which
+--min-speedup 3 checks, failing the command otherwise.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from core.management.benchmark import (
+    median_ms,
+    rolled_back_user,
+    seed_recipes,
+)
+from core.models import Recipe
+from recipe.serializers import RecipeSerializer, RecipeRowSerializer
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe serializers."""
+    help = 'Compare the recipe serializers with their fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--per-recipe', type=int, default=3,
+                            help='Tags and ingredients of each recipe.')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--min-speedup', type=float,
+                            help='Fail if the fast path is not this many '
+                                 'times faster.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with rolled_back_user() as user:
+            seed_recipes(user, options['recipes'], options['per_recipe'])
+            results = self._cases(user, options)
+
+        self.stdout.write(json.dumps(results, indent=2))
+        if not results['same_payload']:
+            raise CommandError('The fast path renders different JSON.')
+        min_speedup = options['min_speedup']
+        if min_speedup is not None and results['speedup'] < min_speedup:
+            raise CommandError(
+                f'The fast path is {results["speedup"]} times faster, '
+                f'less than {min_speedup}.')
+
+    def _cases(self, user, options):
+        """Measure both serializers on the recipes of a user."""
+        queryset = Recipe.objects.for_user(user).order_by('-id')
+
+        def serializer():
+            return RecipeSerializer(
+                queryset.with_tags_and_ingredients(), many=True).data
+
+        def fast_path():
+            return RecipeRowSerializer(
+                RecipeRowSerializer.rows(queryset), many=True).data
+
+        per_thousand = 1000 / options['recipes']
+        results = {
+            name: {'total_ms': round(
+                median_ms(path, options['repeat']) * per_thousand, 3)}
+            for name, path in [('serializer', serializer),
+                               ('fast_path', fast_path)]
+        }
+        results['speedup'] = round(
+            results['serializer']['total_ms']
+            / results['fast_path']['total_ms'], 1)
+        renderer = JSONRenderer()
+        results['same_payload'] = \
+            renderer.render(serializer()) == renderer.render(fast_path())
+        return results
@@ -0,0 +1,81 @@
+"""
+Django command to print the query plan of each API query.
+
+The querysets are built by the API viewsets themselves, for a given user,
+so the plans shown are the ones the API actually runs. Use this to check
+that the per-user indexes are picked up.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Tag
+from recipe import views
+
+
+def build_api_queries(user):
+    """Return the querysets the API runs for a user, keyed by name."""
+    factory = APIRequestFactory()
+
+    def viewset_queryset(viewset_class, action, params=None):
+        viewset = viewset_class(action=action, format_kwarg=None)
+        viewset.request = Request(factory.get('/', params or {}))
+        viewset.request.user = user
+        return viewset.get_queryset()
+
+    return {
+        'recipe-list': viewset_queryset(views.RecipeViewSet, 'list'),
+        'recipe-list-filtered': viewset_queryset(
+            views.RecipeViewSet, 'list', {'tags': '1,2', 'ingredients': '3'},
+        ),
+        'recipe-detail': viewset_queryset(
+            views.RecipeViewSet, 'retrieve').filter(pk=1),
+        'tag-list': viewset_queryset(views.TagViewSet, 'list'),
+        'ingredient-list': viewset_queryset(views.IngredientViewSet, 'list'),
+        'tag-list-assigned': viewset_queryset(
+            views.TagViewSet, 'list', {'assigned_only': 1}),
+        'tag-list-popular': viewset_queryset(
+            views.TagViewSet, 'list', {'ordering': 'popular'}),
+        'tag-autocomplete': viewset_queryset(
+            views.TagViewSet, 'list', {'q': 'dinner'}),
+        'ingredient-autocomplete': viewset_queryset(
+            views.IngredientViewSet, 'list', {'prefix': 'tom'}),
+        'tag-get-or-create': Tag.objects.filter(user=user, name='Dinner'),
+    }
+
+
+class Command(BaseCommand):
+    """Django command to explain the API queries."""
+    help = 'Print EXPLAIN output for each API query.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email',
+                            help='User to build the queries for. '
+                                 'Defaults to the first user.')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run the queries (EXPLAIN ANALYZE).')
+        parser.add_argument('--disable-seqscan', action='store_true',
+                            help='Discourage sequential scans, to check an '
+                                 'index is usable on small tables.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users = get_user_model().objects.order_by('id')
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No user found to build the queries for.')
+
+        with transaction.atomic():
+            if options['disable_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in build_api_queries(user).items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(queryset.explain(analyze=options['analyze']))
+                self.stdout.write('')
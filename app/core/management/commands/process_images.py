@@ -0,0 +1,66 @@
+"""
+Django command to process uploaded recipe images.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipe.images import claim_next_job, process_job
+
+
+class Command(BaseCommand):
+    """Django command running a pool of image processing workers."""
+    help = 'Process queued recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Number of worker threads.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.stdout.write(
+            f'Processing images with {options["workers"]} workers...')
+        if options['workers'] == 1:
+            self._work(options)
+        else:
+            threads = [
+                threading.Thread(target=self._work_thread, args=(options,))
+                for _ in range(options['workers'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS('Image queue empty.'))
+
+    def _work_thread(self, options):
+        """Run a worker in its own thread, with its own connection.
+
+        Pillow releases the GIL while resizing and encoding, so worker
+        threads do run in parallel."""
+        try:
+            self._work(options)
+        finally:
+            connection.close()
+
+    def _work(self, options):
+        """Process jobs until the queue is empty (with --once) or forever."""
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            if process_job(job):
+                self.stdout.write(f'Processed {job}.')
+            else:
+                self.stderr.write(f'Failed to process {job}.')
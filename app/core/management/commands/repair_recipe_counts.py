@@ -0,0 +1,35 @@
+"""
+Django command to recompute the recipe counts of tags and ingredients.
+
+The counts are maintained as links change, so this is only needed after
+links were written around the ORM, or to check nothing drifted. Items
+are updated in batches of primary keys, each in its own transaction, so
+that no batch holds its row locks for long.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to repair recipe counts."""
+    help = 'Recompute the recipe counts of tags and ingredients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        batch_size = options['batch_size']
+        for model in [Tag, Ingredient]:
+            last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            repaired = 0
+            for start in range(0, last_pk, batch_size):
+                with transaction.atomic():
+                    repaired += model.objects.filter(
+                        pk__gt=start, pk__lte=start + batch_size,
+                    ).repair_recipe_count()
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {repaired} repaired')
@@ -0,0 +1,154 @@
+"""
+Django command to seed the database with users and their recipes.
+
+The data is inserted in bulk, one user at a time, and kept: it is meant
+for load testing (see benchmark_api) and local development. Seeded users
+have @seed.example.com addresses and the password SEED_PASSWORD, and are
+deleted by --clear. Names and titles are drawn from small vocabularies
+with a fixed random seed, so that runs with the same options generate
+the same data.
+"""
+import json
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.management.benchmark import analyze
+from core.models import Recipe, Tag, Ingredient
+
+SEED_DOMAIN = 'seed.example.com'
+SEED_PASSWORD = 'seedpass123'
+
+TAG_WORDS = [
+    'breakfast', 'lunch', 'dinner', 'dessert', 'vegan', 'vegetarian',
+    'quick', 'spicy', 'healthy', 'comfort', 'party', 'summer', 'winter',
+    'baking', 'grill', 'soup', 'salad', 'snack', 'brunch', 'holiday',
+]
+INGREDIENT_WORDS = [
+    'tomato', 'basil', 'garlic', 'onion', 'potato', 'carrot', 'chicken',
+    'beef', 'salmon', 'rice', 'pasta', 'flour', 'butter', 'egg', 'milk',
+    'cheese', 'lemon', 'pepper', 'spinach', 'mushroom', 'chickpea',
+    'lentil', 'coconut', 'ginger', 'chili', 'honey', 'apple', 'almond',
+]
+TITLE_WORDS = [
+    'roasted', 'baked', 'fried', 'grilled', 'creamy', 'crispy', 'spicy',
+    'slow cooked', 'stuffed', 'glazed', 'fresh', 'smoky', 'easy',
+]
+DISH_WORDS = [
+    'soup', 'stew', 'curry', 'salad', 'pie', 'risotto', 'tacos', 'bowl',
+    'bake', 'pasta', 'sandwich', 'stir fry', 'omelette', 'cake',
+]
+
+
+def seeded_users():
+    """Return the seeded users."""
+    return get_user_model().objects.filter(
+        email__endswith=f'@{SEED_DOMAIN}')
+
+
+class Command(BaseCommand):
+    """Django command to seed the database."""
+    help = 'Generate users, recipes, tags and ingredients in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=200,
+                            help='Recipes per user.')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user.')
+        parser.add_argument('--ingredients', type=int, default=50,
+                            help='Ingredients per user.')
+        parser.add_argument('--per-recipe', type=int, default=3,
+                            help='Tags and ingredients linked per recipe.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete the seeded users first.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        start = time.perf_counter()
+        if options['clear']:
+            self.stdout.write('Deleting seeded users...')
+            seeded_users().delete()
+
+        rng = random.Random(options['seed'])
+        first = seeded_users().count()
+        password = make_password(SEED_PASSWORD)
+        User = get_user_model()
+        for number in range(first, first + options['users']):
+            with transaction.atomic():
+                user = User.objects.create(
+                    email=f'user-{number}@{SEED_DOMAIN}',
+                    name=f'Seed user {number}',
+                    password=password,
+                )
+                self._seed_user(user, rng, options)
+
+        analyze(Recipe, Tag, Ingredient, Recipe.tags.through,
+                Recipe.ingredients.through)
+
+        self.stdout.write(json.dumps({
+            'users': options['users'],
+            'recipes': options['users'] * options['recipes'],
+            'seconds': round(time.perf_counter() - start, 3),
+        }))
+
+    def _seed_user(self, user, rng, options):
+        """Create the recipes, tags and ingredients of a user."""
+        batch_size = options['batch_size']
+        tags = Tag.objects.bulk_create(
+            [Tag(user=user, name=f'{rng.choice(TAG_WORDS)} {i}')
+             for i in range(options['tags'])],
+            batch_size=batch_size,
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            [Ingredient(user=user, name=f'{rng.choice(INGREDIENT_WORDS)} {i}')
+             for i in range(options['ingredients'])],
+            batch_size=batch_size,
+        )
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user=user,
+                    title=f'{rng.choice(TITLE_WORDS).capitalize()} '
+                          f'{rng.choice(INGREDIENT_WORDS)} '
+                          f'{rng.choice(DISH_WORDS)}',
+                    description=' '.join(rng.choices(INGREDIENT_WORDS, k=8)),
+                    time_minutes=rng.randint(5, 180),
+                    price=f'{rng.uniform(1, 50):.2f}',
+                )
+                for _ in range(options['recipes'])
+            ],
+            batch_size=batch_size,
+        )
+
+        per_recipe = options['per_recipe']
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                for recipe in recipes
+                for tag in rng.sample(tags, min(per_recipe, len(tags)))
+            ],
+            batch_size=batch_size,
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            [
+                Recipe.ingredients.through(
+                    recipe_id=recipe.id, ingredient_id=ingredient.id)
+                for recipe in recipes
+                for ingredient in rng.sample(
+                    ingredients, min(per_recipe, len(ingredients)))
+            ],
+            batch_size=batch_size,
+        )
+
+        # Bulk inserts send no signals, so what they maintain is computed
+        # here.
+        Tag.objects.filter(user=user).repair_recipe_count()
+        Ingredient.objects.filter(user=user).repair_recipe_count()
+        Recipe.objects.filter(user=user).update_search_vector()
@@ -1,27 +1,95 @@
 """
-Django command to wait for the database to be available.
+Django command to wait for the databases to be available.
+
+Each database is probed with a connection and a SELECT 1, concurrently,
+retrying with exponential backoff and jitter until it answers or the
+timeout is reached. System checks are not run, to start up sooner.
 """
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import random
 import time
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.conf import settings
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
+    help = 'Wait until the databases accept connections.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before failing, 0 to wait forever.')
+        parser.add_argument(
+            '--interval', type=float, default=0.1,
+            help='Seconds to wait after the first failed attempt.')
+        parser.add_argument(
+            '--max-interval', type=float, default=5,
+            help='Upper bound of the wait between attempts.')
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to wait for, all by default.')
 
     def handle(self, *args, **options):
         """Entrypoint for command."""
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
+        aliases = options['databases'] or list(settings.DATABASES)
+        start = time.monotonic()
+        deadline = start + options['timeout'] if options['timeout'] else None
+
+        with ThreadPoolExecutor(len(aliases)) as executor:
+            ready = dict(zip(aliases, executor.map(
+                lambda alias: self.wait_for(alias, deadline, options),
+                aliases,
+            )))
+
+        unavailable = [alias for alias in aliases if not ready[alias]]
+        if unavailable:
+            raise CommandError(
+                f'Database unavailable after {options["timeout"]} seconds: '
+                f'{", ".join(unavailable)}.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Database available! Ready in {time.monotonic() - start:.2f} '
+            f'seconds.'
+        ))
+
+    def wait_for(self, alias, deadline, options):
+        """Return whether a database answered before the deadline."""
+        for attempt in itertools.count():
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.check_database(alias)
+                return True
             except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                pass
+
+            backoff = min(options['max_interval'],
+                          options['interval'] * 2 ** attempt)
+            # Jitter keeps the instances of a deploy from retrying in step.
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            self.stdout.write(
+                f'Database {alias} unavailable, waiting {delay:.2f} '
+                f'seconds...'
+            )
+            time.sleep(delay)
 
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+    def check_database(self, alias):
+        """Connect to a database and run a trivial query."""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()
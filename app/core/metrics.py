@@ -0,0 +1,227 @@
+"""
+Request performance metrics.
+
+core.middleware.request_metrics_middleware times each request and, per
+resolved view and action, records into histograms of this process:
+
+- the wall time of the request,
+- the number of database queries and the time spent in them, recorded
+  by an execute wrapper added to every connection, so that the queries
+  of any thread working for the request count,
+- the time spent representing instances in serializers using
+  TimedSerializerMixin, less the queries it made,
+- the size of the response.
+
+The timings of a request are returned in its Server-Timing header, and
+the histograms are rendered in the Prometheus text format by
+render_prometheus. Like the other stats, they are per process.
+
+The metrics endpoint is served to staff users and, for Prometheus, to
+requests with the METRICS_TOKEN bearer token (HasMetricsToken), e.g.
+with `authorization: {credentials: ...}` in its scrape config.
+"""
+from bisect import bisect_left
+import contextvars
+import hmac
+import threading
+import time
+
+from django.conf import settings
+
+from rest_framework.permissions import BasePermission
+
+# Metrics of the request being handled, if measured.
+current = contextvars.ContextVar('request_metrics', default=None)
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class RequestMetrics:
+    """Counters of one request."""
+    __slots__ = ('start', 'queries', 'db_time', 'serializer_time',
+                 'serializing')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def server_timing(self, total):
+        """Return the Server-Timing header value, in milliseconds."""
+        queries = '1 query' if self.queries == 1 \
+            else f'{self.queries} queries'
+        return (
+            f'db;dur={self.db_time * 1000:.3f};desc="{queries}", '
+            f'serialize;dur={self.serializer_time * 1000:.3f}, '
+            f'total;dur={total * 1000:.3f}'
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper counting the queries of the measured request."""
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Add record_query to a new connection (connection_created)."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin adding the time spent representing instances to
+    the measured request. Nested serializers are not counted twice."""
+
+    def to_representation(self, instance):
+        metrics = current.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+
+        metrics.serializing = True
+        start, db_time = time.perf_counter(), metrics.db_time
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializing = False
+            metrics.serializer_time += (
+                time.perf_counter() - start - (metrics.db_time - db_time))
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram, by view and action."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Return the histogram in the Prometheus text format."""
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = sorted(
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            )
+        for (view, action), counts, total in series:
+            labels = f'view="{view}",action="{action}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} '
+                    f'{cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+request_duration = Histogram(
+    'api_request_duration_seconds', 'Wall time of requests.',
+    DURATION_BUCKETS)
+request_queries = Histogram(
+    'api_request_queries', 'Database queries made by requests.',
+    QUERY_BUCKETS)
+request_db_duration = Histogram(
+    'api_request_db_duration_seconds',
+    'Time requests spent in database queries.', DURATION_BUCKETS)
+request_serializer_duration = Histogram(
+    'api_request_serializer_duration_seconds',
+    'Time requests spent in serializers, queries excluded.',
+    DURATION_BUCKETS)
+response_size = Histogram(
+    'api_response_size_bytes', 'Size of response bodies.', SIZE_BUCKETS)
+
+HISTOGRAMS = [
+    request_duration,
+    request_queries,
+    request_db_duration,
+    request_serializer_duration,
+    response_size,
+]
+
+
+def view_labels(request):
+    """Return the view and action a request was resolved to."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved', request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return match.view_name, actions.get(
+        request.method.lower(), request.method.lower())
+
+
+def observe(request, response, metrics):
+    """Record a finished request and return its wall time."""
+    total = time.perf_counter() - metrics.start
+    labels = view_labels(request)
+    request_duration.observe(labels, total)
+    request_queries.observe(labels, metrics.queries)
+    request_db_duration.observe(labels, metrics.db_time)
+    request_serializer_duration.observe(labels, metrics.serializer_time)
+    if not response.streaming:
+        response_size.observe(labels, len(response.content))
+    return total
+
+
+def render_prometheus(counters=()):
+    """Return the metrics of this process in the Prometheus text format.
+
+    counters are (name, description, values, label names) of counters
+    kept by other modules, values being keyed by their labels joined
+    with ':', like the connection stats."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for name, description, values, label_names in counters:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(values.items()):
+            labels = ','.join(
+                f'{label}="{part}"'
+                for label, part in zip(label_names, key.split(':')))
+            lines.append(f'{name}{{{labels}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class HasMetricsToken(BasePermission):
+    """Allow requests with the METRICS_TOKEN bearer token, if set."""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        return bool(token) and hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            f'Bearer {token}'.encode(),
+        )
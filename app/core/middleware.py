@@ -0,0 +1,44 @@
+"""
+Middleware of the project.
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from core import metrics
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """Measure requests (see core.metrics) and add their Server-Timing
+    header. Goes first, to time the other middleware too."""
+    if not settings.REQUEST_METRICS:
+        raise MiddlewareNotUsed
+
+    def finish(request, response, request_metrics):
+        total = metrics.observe(request, response, request_metrics)
+        response['Server-Timing'] = request_metrics.server_timing(total)
+        return response
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            request_metrics = metrics.RequestMetrics()
+            token = metrics.current.set(request_metrics)
+            try:
+                response = await get_response(request)
+            finally:
+                metrics.current.reset(token)
+            return finish(request, response, request_metrics)
+    else:
+        def middleware(request):
+            request_metrics = metrics.RequestMetrics()
+            token = metrics.current.set(request_metrics)
+            try:
+                response = get_response(request)
+            finally:
+                metrics.current.reset(token)
+            return finish(request, response, request_metrics)
+
+    return middleware
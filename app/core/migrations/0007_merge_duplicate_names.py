@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:29
+
+from django.db import migrations, models
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a (user, name) into the oldest
+    one, so the unique constraints can be added."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in [('Tag', 'tags'), ('Ingredient', 'ingredients')]:
+        Model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        column = f'{model_name.lower()}_id'
+        duplicates = Model.objects.values('user_id', 'name')\
+            .annotate(keep_id=models.Min('id'), total=models.Count('id'))\
+            .filter(total__gt=1)
+        for duplicate in duplicates:
+            keep_id = duplicate['keep_id']
+            others = Model.objects.filter(
+                user_id=duplicate['user_id'],
+                name=duplicate['name'],
+            ).exclude(id=keep_id)
+            for other in others:
+                linked = through.objects.filter(**{column: keep_id})\
+                    .values_list('recipe_id', flat=True)
+                # Drop links that would duplicate an existing one, then
+                # point the remaining links at the kept row.
+                through.objects.filter(
+                    **{column: other.id, 'recipe_id__in': linked}
+                ).delete()
+                through.objects.filter(**{column: other.id})\
+                    .update(**{column: keep_id})
+                other.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
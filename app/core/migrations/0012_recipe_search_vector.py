@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:43
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_content_hashed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE core_recipe SET search_vector =
+                setweight(to_tsvector('english', title), 'A') ||
+                setweight(to_tsvector('english', description), 'B') ||
+                setweight(to_tsvector('english', coalesce((
+                    SELECT string_agg(core_ingredient.name, ' ')
+                    FROM core_ingredient
+                    JOIN core_recipe_ingredients
+                        ON core_recipe_ingredients.ingredient_id =
+                            core_ingredient.id
+                    WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+                ), '')), 'C')
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ),
+    ]
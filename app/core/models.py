@@ -3,21 +3,37 @@ Database models
 """
 from django.conf import settings
 
-from django.db import models
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.db import connection, models
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
-import uuid
+from itertools import islice
 import os
+import re
+
+from core.storage import content_hashed_storage
+
+# Text search configuration of the recipe search vector.
+SEARCH_CONFIG = 'english'
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image."""
-    ext = os.path.splitext(filename)[1]
-    filename = f'{uuid.uuid4()}{ext}'
-    return os.path.join('uploads', 'recipe', filename)
+    """Generate file path for new recipe image.
+    The storage then names the file after the hash of its content."""
+    return os.path.join('uploads', 'recipe', os.path.basename(filename))
 
 
 class UserManager(BaseUserManager):
@@ -55,6 +71,114 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
 
 
+class ImageStatus(models.TextChoices):
+    """Processing status of an uploaded image."""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Queryset for recipes, aware of what the API needs to render them."""
+
+    def for_user(self, user):
+        """Limit recipes to the ones owned by the given user."""
+        return self.filter(user=user)
+
+    def search(self, text):
+        """Filter recipes matching a web search style query, annotated
+        with their rank and best matches first."""
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch')
+        # The rank is cast to double precision so that it round-trips
+        # exactly through a pagination cursor.
+        rank = Cast(
+            SearchRank(models.F('search_vector'), query), models.FloatField())
+        return self.filter(search_vector=query)\
+            .annotate(rank=rank)\
+            .order_by('-rank', '-id')
+
+    def update_search_vector(self):
+        """Recompute the stored search vector of the recipes.
+
+        Titles weigh most, then descriptions, then ingredient names."""
+        ingredient_names = models.Subquery(
+            Ingredient.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(names=StringAgg('name', ' ')).values('names')
+        )
+        return self.update(search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector('description', weight='B', config=SEARCH_CONFIG) +
+            SearchVector(
+                Coalesce(ingredient_names, models.Value('')),
+                weight='C',
+                config=SEARCH_CONFIG,
+            )
+        ))
+
+    def _filter_related(self, through, column, ids, match):
+        """Filter on a many-to-many relation without joining it.
+
+        With match 'any' a recipe is kept if it has at least one of the
+        given ids (correlated EXISTS). With match 'all' it must have every
+        one of them, which is counted per recipe in SQL (GROUP BY/HAVING).
+        Neither form duplicates recipe rows, so no DISTINCT is needed.
+        """
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if match == 'all':
+            matching = links.values('recipe_id')\
+                .annotate(matched=models.Count(column))\
+                .filter(matched=len(set(ids)))\
+                .values('recipe_id')
+            return self.filter(pk__in=matching)
+
+        return self.filter(
+            models.Exists(links.filter(recipe_id=models.OuterRef('pk')))
+        )
+
+    def with_tags(self, tag_ids, match='any'):
+        """Filter recipes having any (or all) of the given tags."""
+        return self._filter_related(
+            Recipe.tags.through, 'tag_id', tag_ids, match,
+        )
+
+    def with_ingredients(self, ingredient_ids, match='any'):
+        """Filter recipes having any (or all) of the given ingredients."""
+        return self._filter_related(
+            Recipe.ingredients.through, 'ingredient_id', ingredient_ids, match,
+        )
+
+    def with_tags_and_ingredients(self):
+        """Prefetch tags and ingredients, selecting only the columns
+        the nested serializers render, so that serializing any number
+        of recipes costs a fixed number of queries."""
+        return self.prefetch_related(*self._related_prefetches())
+
+    def chunks_with_tags_and_ingredients(self, chunk_size=500):
+        """Yield lists of recipes read through a server-side cursor, with
+        tags and ingredients prefetched for each list. Only one chunk is
+        held in memory at a time."""
+        recipes = self.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(recipes, chunk_size))
+            if not chunk:
+                return
+            models.prefetch_related_objects(
+                chunk, *self._related_prefetches())
+            yield chunk
+
+    def _related_prefetches(self):
+        return [
+            models.Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+            models.Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name'),
+            ),
+        ]
+
+
 class Recipe(models.Model):
     """Recipe object. This represents the database table and its fields.
     Each attribute of this class corresponds to a field in the table.
@@ -72,31 +196,251 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=content_hashed_storage,
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        blank=True,
+    )
+    # Storage paths of the processed image, by size and format, e.g.
+    # {'thumb': {'webp': 'uploads/...', 'jpeg': 'uploads/...'}, ...}
+    image_renditions = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Title, description and ingredient names, kept up to date by
+    # recipe.signals, for full text search.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Recipes are always listed per user, newest first.
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+            # Looked up before deleting a stored file, see recipe.images.
+            models.Index(fields=['image'], name='recipe_image_idx'),
+            GinIndex(
+                fields=['image_renditions'],
+                name='recipe_renditions_idx',
+                opclasses=['jsonb_path_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class RecipeAttrQuerySet(models.QuerySet):
+    """Queryset for tags and ingredients."""
+
+    def autocomplete(self, text, prefix=False):
+        """Filter names starting with (prefix) or resembling the text,
+        most similar and most used first.
+
+        Both the regular expression and the trigram similarity operator
+        are answered from the trigram index on name."""
+        pattern = re.escape(text)
+        if prefix:
+            matches = models.Q(name__iregex=f'^{pattern}')
+        else:
+            matches = models.Q(name__iregex=pattern) | \
+                models.Q(name__trigram_similar=text)
+        return self.filter(matches).annotate(
+            similarity=TrigramSimilarity('name', text),
+        ).order_by('-similarity', '-recipe_count', 'name')
+
+    def change_recipe_count(self, deltas):
+        """Add to the recipe count of items, given a mapping of item id to
+        the number of links added (or removed, if negative)."""
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        delta = models.Case(
+            *[models.When(pk=pk, then=models.Value(delta))
+              for pk, delta in deltas.items()],
+            output_field=models.IntegerField(),
+        )
+        # A counter out of step is left for repair_recipe_counts to fix,
+        # rather than failing the write on the non-negative constraint.
+        return self.filter(pk__in=deltas).update(
+            recipe_count=Greatest(models.F('recipe_count') + delta, 0))
+
+    def repair_recipe_count(self):
+        """Recompute the recipe count of items from their links, returning
+        how many were out of step."""
+        through = self.model.recipe_set.through
+        column = f'{self.model._meta.model_name}_id'
+        actual = Coalesce(models.Subquery(
+            through.objects.filter(**{column: models.OuterRef('pk')})
+            .order_by().values(column)
+            .annotate(count=models.Count('pk')).values('count')
+        ), 0)
+        return self.exclude(recipe_count=actual).update(recipe_count=actual)
+
+
+class RecipeCountMixin:
+    """Leave recipe_count out of saves of existing items.
+
+    The count only changes through the queryset updates of
+    RecipeAttrQuerySet, which a save writing back the count loaded with
+    the item, e.g. on a rename, would undo."""
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'recipe_count'
+            ]
+        super().save(*args, **kwargs)
+
+
+class Tag(RecipeCountMixin, models.Model):
     """Tag for filtering recipes."""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of recipes linked, kept up to date by recipe.signals.
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also serves the per-user lookups by name and ordering by name.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_user_name',
+            ),
+        ]
+        indexes = [
+            # Autocomplete matches anywhere in the name.
+            GinIndex(
+                fields=['name'],
+                opclasses=['gin_trgm_ops'],
+                name='tag_name_trgm_idx',
+            ),
+            # Assigned only filtering and ordering by popularity.
+            models.Index(
+                fields=['user', 'recipe_count'],
+                name='tag_user_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountMixin, models.Model):
     """Ingredient for recipes."""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of recipes linked, kept up to date by recipe.signals.
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also serves the per-user lookups by name and ordering by name.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_user_name',
+            ),
+        ]
+        indexes = [
+            # Autocomplete matches anywhere in the name.
+            GinIndex(
+                fields=['name'],
+                opclasses=['gin_trgm_ops'],
+                name='ingredient_name_trgm_idx',
+            ),
+            # Assigned only filtering and ordering by popularity.
+            models.Index(
+                fields=['user', 'recipe_count'],
+                name='ingredient_user_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class ImageJob(models.Model):
+    """Image waiting to be processed by the process_images command."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    # Storage name of the uploaded image, so that a job superseded by a
+    # newer upload can tell.
+    source = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a worker last claimed the job, which it holds for
+    # recipe.images.JOB_LEASE.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Workers pick the oldest pending job.
+            models.Index(
+                fields=['status', 'id'],
+                name='imagejob_status_id_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Image of recipe {self.recipe_id} ({self.status})'
+
+
+class DataVersionQuerySet(models.QuerySet):
+    """Queryset for data versions."""
+
+    def bump(self, user_id):
+        """Record a change to the recipe data of a user, in the current
+        transaction."""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, version, modified_at) '
+                'VALUES (%s, 1, %s) ON CONFLICT (user_id) DO UPDATE SET '
+                f'version = {table}.version + 1, modified_at = '
+                f'GREATEST({table}.modified_at, EXCLUDED.modified_at)',
+                [user_id, timezone.now()],
+            )
+
+
+class DataVersion(models.Model):
+    """Version of the recipes, tags and ingredients of a user, bumped by
+    every change to them, deletes included (see recipe.cache)."""
+    # Without a constraint, and left behind when the user is deleted, as
+    # deleting the recipes of the user bumps the version meanwhile.
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='+',
+    )
+    version = models.PositiveBigIntegerField(default=1)
+    modified_at = models.DateTimeField()
+
+    objects = DataVersionQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Data of user {self.user_id} (version {self.version})'
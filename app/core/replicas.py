@@ -0,0 +1,103 @@
+"""
+Routing of reads to the database replicas.
+
+Replicas are configured with DB_REPLICA_HOST and listed in
+settings.DATABASE_REPLICAS. Views using ReplicaReadMixin read from a
+random replica while they handle a safe (GET, HEAD, OPTIONS) request.
+Everything else, writes, reads inside a transaction and the reads of
+other requests and commands, stays on the primary.
+
+Replicas lag behind the primary, so a user who just wrote is pinned to
+the primary for REPLICA_PIN_SECONDS, to read their own writes. Pins are
+kept in the Django cache named by REPLICA_PIN_CACHE_ALIAS, which should
+be shared by all processes, or else per process.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+from core.cache import LRUCache
+
+_read_from_replica = contextvars.ContextVar(
+    'read_from_replica', default=False)
+
+local_pins = LRUCache(max_size=10000, ttl=settings.REPLICA_PIN_SECONDS)
+
+
+def _pin_key(user):
+    return f'replica:pin:{user.pk}'
+
+
+def _shared_cache():
+    alias = settings.REPLICA_PIN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def pin_to_primary(user):
+    """Send the reads of a user to the primary for a while."""
+    local_pins.set(_pin_key(user), True)
+    shared_cache = _shared_cache()
+    if shared_cache is not None:
+        shared_cache.set(_pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    """Return whether the reads of a user must go to the primary."""
+    if local_pins.get(_pin_key(user)):
+        return True
+    shared_cache = _shared_cache()
+    return shared_cache is not None and bool(shared_cache.get(_pin_key(user)))
+
+
+class ReplicaRouter:
+    """Send reads to a replica when the current request allows it."""
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get() or not settings.DATABASE_REPLICAS:
+            return None
+        if connections['default'].in_atomic_block:
+            # Reads in a transaction on the primary must see its writes.
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """View mixin reading from the replicas for safe requests, unless the
+    user wrote recently."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_from_replica.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_from_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Runs after authentication, so the user is known.
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not (
+                request.user.is_authenticated and is_pinned(request.user)):
+            _read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and \
+                response.status_code < 400 and request.user.is_authenticated:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
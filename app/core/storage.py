@@ -0,0 +1,51 @@
+"""
+File storage for uploaded media.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.utils.deconstruct import deconstructible
+
+
+def lock_file(name):
+    """Lock a stored name until the end of the current transaction.
+
+    Saving a file and the reference to it in one transaction, and
+    checking that a file has no references and deleting it in another,
+    both hold the lock of its name. A file saved again for a new
+    reference is then not deleted before that reference is visible."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [name])
+
+
+@deconstructible
+class ContentHashedStorage(FileSystemStorage):
+    """Storage naming files after the SHA-256 of their content.
+
+    Only the directory and extension of the requested name are kept. As a
+    name always refers to the same bytes, identical files are stored once
+    and can be cached by clients forever. Callers deleting a file must
+    therefore make sure nothing else refers to it, under lock_file, which
+    saving takes too."""
+
+    def save(self, name, content, max_length=None):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+
+        name = os.path.join(directory, digest[:2], f'{digest}{ext}')
+        lock_file(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+content_hashed_storage = ContentHashedStorage()
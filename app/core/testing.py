@@ -0,0 +1,198 @@
+"""
+Query count regression guard for the API tests.
+
+QueryBaselineMixin checks the queries requests make against the
+baseline checked in at QUERY_BASELINE_PATH, by endpoint name: the
+number of queries and their fingerprints, the SQL with its values and
+savepoint names left out. A test fails when a request makes more
+queries than its baseline or queries of a new kind, and when the
+number of its queries grows with the number of rows it reads.
+
+Each entry also records the endpoint, method and route, it was made on,
+and api_endpoints lists those of the URL conf, so that a test can check
+every endpoint of the API has a baseline.
+
+After a change to the queries of an endpoint, review it and update the
+baseline by running the tests with QUERY_BASELINE_UPDATE=1.
+"""
+import json
+import os
+from pathlib import Path
+import re
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+
+QUERY_BASELINE_PATH = Path(__file__).resolve().parent.parent / \
+    'query_baseline.json'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_CAST = re.compile(
+    r'\?::[a-z_]+(?: with(?:out)? time zone| varying| precision)?'
+    r'(?:\[\])?', re.IGNORECASE)
+_LIST = re.compile(r'\((?:\s*\?\s*,)*\s*\?\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_CURSOR = re.compile(r'"_django_curs_[^"]*"')
+_SPACE = re.compile(r'\s+')
+
+# Routes of the API without a query baseline: the schema, its
+# documentation and the API root do not read the database.
+UNCHECKED_ROUTES = {'api/schema/', 'api/docs', 'api/recipe/$'}
+_METHODS = ['get', 'post', 'put', 'patch', 'delete']
+
+
+def fingerprint(sql):
+    """Return the SQL of a query without its values, so that queries
+    differing only by their parameters, or by the number of values in a
+    list or rows in an insert, are the same."""
+    sql = _SAVEPOINT.sub('"s?"', sql)
+    sql = _CURSOR.sub('"_django_curs_?"', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _CAST.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _ROWS.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def api_endpoints(prefix='api/'):
+    """Return the 'METHOD route' of the endpoints of the URL conf under
+    prefix, but UNCHECKED_ROUTES and format suffixes."""
+    endpoints = []
+
+    def add(patterns, route):
+        for pattern in patterns:
+            pattern_route = URLResolver._join_route(
+                route, str(pattern.pattern))
+            if isinstance(pattern, URLResolver):
+                add(pattern.url_patterns, pattern_route)
+                continue
+            if not pattern_route.startswith(prefix) or \
+                    pattern_route in UNCHECKED_ROUTES or \
+                    '(?P<format>' in pattern_route:
+                continue
+            view = pattern.callback
+            actions = getattr(view, 'actions', None)
+            # HEAD, added to the actions of GET once requested, is
+            # served as GET.
+            methods = [
+                method for method in _METHODS
+                if (method in actions if actions is not None
+                    else hasattr(view.cls, method))
+            ]
+            endpoints.extend(
+                f'{method.upper()} {pattern_route}' for method in methods)
+
+    add(get_resolver().url_patterns, '')
+    return endpoints
+
+
+def _endpoint(response):
+    """Return the 'METHOD route' a test client response was made on."""
+    request = getattr(response, 'request', None)
+    match = getattr(response, 'resolver_match', None)
+    if request is None or match is None:
+        return None
+    return f'{request["REQUEST_METHOD"]} {match.route}'
+
+
+def load_baseline(path=QUERY_BASELINE_PATH):
+    """Return the baseline, by endpoint name."""
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def _updating():
+    return bool(int(os.environ.get('QUERY_BASELINE_UPDATE', 0)))
+
+
+class QueryBaselineMixin:
+    """TestCase mixin checking the queries of requests against the
+    checked-in baseline."""
+    query_baseline_path = QUERY_BASELINE_PATH
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._recorded_queries = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if _updating() and cls._recorded_queries:
+            baseline = load_baseline(cls.query_baseline_path)
+            baseline.update(cls._recorded_queries)
+            with open(cls.query_baseline_path, 'w') as baseline_file:
+                json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+                baseline_file.write('\n')
+        super().tearDownClass()
+
+    def capture_queries(self, make_request):
+        """Make a request and return its response and the SQL of its
+        queries, on every database of the test."""
+        contexts = {}
+        for alias in sorted(self.databases):
+            connection = connections[alias]
+            contexts.setdefault(id(connection),
+                                CaptureQueriesContext(connection))
+        for context in contexts.values():
+            context.__enter__()
+        try:
+            response = make_request()
+        finally:
+            for context in contexts.values():
+                context.__exit__(None, None, None)
+        return response, [
+            query['sql']
+            for context in contexts.values()
+            for query in context.captured_queries
+        ]
+
+    def assertQueriesMatchBaseline(self, name, make_request, add_rows=None,
+                                   rows=3):
+        """Check the queries of a request against the baseline of name,
+        and return its response.
+
+        add_rows, if given, creates a number of the rows the request
+        reads: the request is made after creating rows, then as many
+        again, and must make the same number of queries both times."""
+        if add_rows is not None:
+            add_rows(rows)
+        response, queries = self.capture_queries(make_request)
+        if add_rows is not None:
+            add_rows(rows)
+            _, more_queries = self.capture_queries(make_request)
+            if len(more_queries) != len(queries):
+                self.fail(
+                    f'{name}: queries grow with rows, {len(queries)} with '
+                    f'{rows} rows and {len(more_queries)} with {rows * 2}:\n'
+                    + '\n'.join(more_queries))
+
+        fingerprints = sorted({fingerprint(sql) for sql in queries})
+        if _updating():
+            self._recorded_queries[name] = {
+                'queries': len(queries),
+                'fingerprints': fingerprints,
+            }
+            endpoint = _endpoint(response)
+            if endpoint is not None:
+                self._recorded_queries[name]['endpoint'] = endpoint
+            return response
+
+        expected = load_baseline(self.query_baseline_path).get(name)
+        if expected is None:
+            self.fail(f'{name}: no query baseline, run the tests with '
+                      'QUERY_BASELINE_UPDATE=1 to record it.')
+        new = [sql for sql in fingerprints
+               if sql not in expected['fingerprints']]
+        if len(queries) > expected['queries'] or new:
+            self.fail(
+                f'{name}: {len(queries)} queries, baseline '
+                f'{expected["queries"]}. New queries:\n' + '\n'.join(new)
+                + '\nAll queries:\n' + '\n'.join(queries))
+        return response
@@ -0,0 +1,170 @@
+"""
+Tests for the async read views.
+"""
+import asyncio
+from decimal import Decimal
+from io import StringIO
+import json
+import shutil
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import (
+    AsyncRequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ASGIHandler
+from core.models import Recipe
+from recipe.views import RecipeViewSet, TagViewSet
+
+
+@override_settings(ASYNC_READS=True)
+class AsyncReadViewTests(TransactionTestCase):
+    """Test the read actions are served by async views."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        token = Token.objects.create(user=self.user)
+        self.factory = AsyncRequestFactory()
+        # Extra arguments are headers of ASGI requests.
+        self.auth = {'authorization': f'Token {token.key}'}
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('2.00'))
+
+    def test_read_actions_async(self):
+        """Test views with read actions are async, others are not."""
+        self.assertTrue(asyncio.iscoroutinefunction(
+            RecipeViewSet.as_view({'get': 'list', 'post': 'create'})))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            TagViewSet.as_view({'delete': 'destroy'})))
+
+        with override_settings(ASYNC_READS=False):
+            self.assertFalse(asyncio.iscoroutinefunction(
+                RecipeViewSet.as_view({'get': 'list'})))
+
+    def test_list_queries_on_database_threads(self):
+        """Test the queries of a list run on the shared database
+        threads."""
+        view = RecipeViewSet.as_view({'get': 'list'})
+        get_queryset = RecipeViewSet.get_queryset
+        threads = []
+
+        def record_thread(viewset):
+            threads.append(threading.current_thread().name)
+            return get_queryset(viewset)
+
+        with patch.object(RecipeViewSet, 'get_queryset', record_thread):
+            res = async_to_sync(view)(self.factory.get('/', **self.auth))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([r['title'] for r in res.data], ['Soup'])
+        self.assertTrue(threads[0].startswith('async-db'))
+
+    def test_retrieve(self):
+        """Test a detail is served rendered."""
+        view = RecipeViewSet.as_view({'get': 'retrieve'})
+        request = self.factory.get('/', **self.auth)
+
+        res = async_to_sync(view)(request, pk=self.recipe.id)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'"Soup"', res.content)
+
+    def test_unauthenticated_rejected(self):
+        """Test authentication still applies to async reads."""
+        view = TagViewSet.as_view({'get': 'list'})
+
+        res = async_to_sync(view)(AsyncRequestFactory().get('/'))
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_writes_use_sync_view(self):
+        """Test other methods of an async view are served as before."""
+        view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+        request = self.factory.post(
+            '/', {'title': 'Stew', 'time_minutes': 60, 'price': '9.00'},
+            content_type='application/json', **self.auth)
+
+        res = async_to_sync(view)(request)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(Recipe.objects.filter(title='Stew').exists())
+
+
+class AsgiStreamingTests(TransactionTestCase):
+    """Test streaming responses through the ASGI handler."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.token = Token.objects.create(user=self.user)
+        for i in range(5):
+            Recipe.objects.create(
+                user=self.user, title=f'Soup {i}', time_minutes=5,
+                price=Decimal('2.00'))
+
+    async def _get(self, path):
+        """Return the status and body of a GET through the handler."""
+        communicator = ApplicationCommunicator(ASGIHandler(), {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        body = b''
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return start['status'], body
+
+    def test_export(self):
+        """Test an export reading the database between parts is sent
+        whole."""
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            status, body = async_to_sync(self._get)(
+                '/api/recipe/recipes/export/')
+
+        self.assertEqual(status, 200)
+        titles = [json.loads(line)['title'] for line in body.splitlines()]
+        self.assertEqual(sorted(titles), [f'Soup {i}' for i in range(5)])
+
+
+@skipUnless(shutil.which('uwsgi'), 'uwsgi is not installed.')
+class BenchmarkAsgiTests(TransactionTestCase):
+    """Test the server benchmark command."""
+
+    def test_benchmark_asgi(self):
+        """Test both servers answer the load and the data is removed."""
+        out = StringIO()
+
+        call_command('benchmark_asgi', clients=5, requests=20, workers=1,
+                     stdout=out)
+
+        output = out.getvalue()
+        results = json.loads(output[output.index('{'):])
+        self.assertEqual(set(results), {'uwsgi', 'asgi'})
+        for result in results.values():
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['requests_per_second'], 0)
+        self.assertFalse(get_user_model().objects.exists())
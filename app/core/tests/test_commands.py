@@ -1,34 +1,315 @@
 """
 Test custom Django management commands.
 """
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
 
+from core.models import Recipe, Tag, Ingredient
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+@patch('core.management.commands.wait_for_db.Command.check_database')
 class CommandTests(SimpleTestCase):
     """Test commands."""
 
     def test_wait_for_db_ready(self, patched_check):
         """Test waiting for database if database ready."""
-        patched_check.return_value = True
+        out = StringIO()
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', stdout=out)
 
-        patched_check.assert_called_once_with(databases=['default'])
+        self.assertEqual(
+            sorted(call.args[0] for call in patched_check.call_args_list),
+            sorted(settings.DATABASES),
+        )
+        self.assertIn('Ready in', out.getvalue())
 
     @patch('time.sleep')
     def test_wait_for_db_delay(self, patched_sleep, patched_check):
         """Test waiting for database when getting OperationalError."""
         patched_check.side_effect = [Psycopg2OpError] * 2 + \
-            [OperationalError] * 3 + [True]
+            [OperationalError] * 3 + [None]
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', database=['default'], stdout=StringIO())
 
         self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        patched_check.assert_called_with('default')
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the wait doubles after each attempt, up to a bound."""
+        patched_check.side_effect = [OperationalError] * 6 + [None]
+
+        call_command('wait_for_db', database=['default'], interval=1,
+                     max_interval=8, stdout=StringIO())
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        for delay, backoff in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertGreaterEqual(delay, backoff / 2)
+            self.assertLessEqual(delay, backoff)
+
+    def test_wait_for_db_timeout(self, patched_check):
+        """Test the command fails once the timeout is reached."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaisesMessage(CommandError, 'default'):
+            call_command('wait_for_db', database=['default'], timeout=0.2,
+                         interval=0.05, stdout=StringIO())
+
+    def test_wait_for_db_concurrent(self, patched_check):
+        """Test the databases are checked at the same time."""
+        barrier = threading.Barrier(2, timeout=5)
+        patched_check.side_effect = lambda alias: barrier.wait()
+
+        call_command('wait_for_db', database=['default', 'other'],
+                     stdout=StringIO())
+
+        self.assertEqual(patched_check.call_count, 2)
+
+
+class WaitForDbTests(SimpleTestCase):
+    """Test waiting for a running database."""
+    databases = {'default'}
+
+    def test_wait_for_db_connects(self):
+        """Test the database is probed with a query."""
+        out = StringIO()
+
+        call_command('wait_for_db', database=['default'], timeout=5,
+                     stdout=out)
+
+        self.assertIn('Database available!', out.getvalue())
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the benchmark commands."""
+
+    def test_explain_api_queries_uses_user_indexes(self):
+        """Test the API queries can use the per-user indexes."""
+        get_user_model().objects.create_user('user@example.com', 'pass123')
+        out = StringIO()
+
+        call_command('explain_api_queries', disable_seqscan=True, stdout=out)
+
+        plans = out.getvalue()
+        self.assertIn('recipe_user_id_idx', plans)
+        self.assertIn('unique_tag_user_name', plans)
+        self.assertRegex(
+            plans, 'unique_ingredient_user_name|ingredient_user_count_idx')
+
+    def test_benchmark_recipe_filters(self):
+        """Test the filter benchmark reports results and cleans up."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_recipe_filters',
+            recipes=20, tags=5, ingredients=5, repeat=1, stdout=out,
+        )
+
+        results = json.loads(out.getvalue().split('\n', 1)[1])
+        self.assertEqual(
+            set(results), {'join_distinct', 'exists_any', 'grouped_all'})
+        self.assertEqual(
+            results['join_distinct']['rows'], results['exists_any']['rows'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_recipe_search(self):
+        """Test the search benchmark reports results per size."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_recipe_search',
+            sizes='20,40', matches=5, repeat=1, stdout=out,
+        )
+
+        results = json.loads(out.getvalue().split('\n', 2)[2])
+        self.assertEqual(set(results), {'20', '40'})
+        for cases in results.values():
+            self.assertEqual(cases['search']['rows'], 5)
+            self.assertEqual(cases['icontains']['rows'], 5)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_autocomplete(self):
+        """Test the autocomplete benchmark reports results per size."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_autocomplete', sizes='20,40', repeat=1, stdout=out,
+        )
+
+        results = json.loads(out.getvalue().split('\n', 2)[2])
+        self.assertEqual(set(results), {'20', '40'})
+        self.assertEqual(set(results['40']), {'prefix', 'q'})
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_benchmark_serializers(self):
+        """Test both serializers are timed and render the same JSON."""
+        out = StringIO()
+
+        call_command('benchmark_serializers', recipes=20, repeat=1,
+                     stdout=out)
+
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {
+            'serializer', 'fast_path', 'speedup', 'same_payload'})
+        self.assertTrue(results['same_payload'])
+        self.assertGreater(results['fast_path']['total_ms'], 0)
+        self.assertGreater(results['speedup'], 0)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_serializers_min_speedup(self):
+        """Test the command fails below the expected speedup."""
+        with self.assertRaisesMessage(CommandError, 'less than 1000000'):
+            call_command('benchmark_serializers', recipes=5, repeat=1,
+                         min_speedup=1000000, stdout=StringIO())
+
+    def test_benchmark_json(self):
+        """Test the JSON benchmark reports results per size."""
+        out = StringIO()
+
+        call_command('benchmark_json', sizes='20,40', repeat=1, stdout=out)
+
+        results = json.loads(out.getvalue().split('\n', 2)[2])
+        self.assertEqual(set(results), {'20', '40'})
+        self.assertGreater(results['40']['bytes'], results['20']['bytes'])
+        self.assertGreater(results['40']['render_speedup'], 0)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_repair_recipe_counts(self):
+        """Test repairing recipe counts that drifted."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'pass123')
+        recipe = Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price='2.00')
+        ingredient = Ingredient.objects.create(user=user, name='Leek')
+        recipe.ingredients.add(ingredient)
+        Ingredient.objects.update(recipe_count=7)
+        out = StringIO()
+
+        call_command('repair_recipe_counts', batch_size=1, stdout=out)
+
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 1)
+        self.assertIn('ingredients: 1 repaired', out.getvalue())
+
+
+class SeedDataTests(TestCase):
+    """Test the seed_data command."""
+
+    def test_seed_data(self):
+        """Test users are seeded with their recipes, counts and search."""
+        call_command('seed_data', users=2, recipes=10, tags=4,
+                     ingredients=5, per_recipe=2, stdout=StringIO())
+
+        users = get_user_model().objects.filter(
+            email__endswith='@seed.example.com')
+        self.assertEqual(users.count(), 2)
+        self.assertTrue(users[0].check_password('seedpass123'))
+        recipes = Recipe.objects.filter(user__in=users)
+        self.assertEqual(recipes.count(), 20)
+        self.assertFalse(recipes.filter(search_vector=None).exists())
+        tag = Tag.objects.filter(user__in=users).first()
+        self.assertEqual(tag.recipe_count, tag.recipe_set.count())
+        self.assertEqual(Ingredient.objects.filter(
+            user__in=users, recipe=recipes[0]).count(), 2)
+
+    def test_seed_data_clear(self):
+        """Test seeding again adds users, unless cleared first."""
+        options = {'users': 1, 'recipes': 1, 'stdout': StringIO()}
+        call_command('seed_data', **options)
+        call_command('seed_data', **options)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+        call_command('seed_data', clear=True, **options)
+
+        self.assertEqual(get_user_model().objects.count(), 1)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BenchmarkApiTests(TransactionTestCase):
+    """Test the benchmark_api command."""
+
+    def setUp(self):
+        call_command('seed_data', users=2, recipes=5, stdout=StringIO())
+
+    def test_benchmark_api(self):
+        """Test every scenario is measured and the data is removed."""
+        out = StringIO()
+        recipes = Recipe.objects.count()
+
+        with tempfile.NamedTemporaryFile('r') as output_file:
+            call_command('benchmark_api', requests=6, concurrency=2,
+                         output=output_file.name, stdout=out)
+            results = json.load(output_file)
+
+        self.assertEqual(list(results['scenarios']), [
+            'list', 'detail', 'filter', 'create', 'upload'])
+        for result in results['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertGreater(result['p99_ms'], 0)
+        self.assertEqual(Recipe.objects.count(), recipes)
+        self.assertFalse(Tag.objects.filter(name='benchmark').exists())
+        stored = [files for _, _, files in os.walk(settings.MEDIA_ROOT)]
+        self.assertFalse(any(stored))
+
+    def test_benchmark_api_compare(self):
+        """Test the command fails on more queries than a baseline."""
+        with tempfile.NamedTemporaryFile('w') as baseline_file:
+            json.dump({'scenarios': {
+                'list': {'requests_per_second': 1, 'p50_ms': 1,
+                         'p95_ms': 1, 'p99_ms': 1,
+                         'queries_per_request': 1},
+            }}, baseline_file)
+            baseline_file.flush()
+
+            with self.assertRaisesMessage(CommandError, 'in: list.'):
+                call_command('benchmark_api', requests=2,
+                             scenarios='list,detail',
+                             compare=baseline_file.name, stdout=StringIO())
+
+    def test_benchmark_api_without_seed(self):
+        """Test the command asks for seeded data."""
+        get_user_model().objects.all().delete()
+
+        with self.assertRaisesMessage(CommandError, 'run seed_data'):
+            call_command('benchmark_api', stdout=StringIO())
+
+
+class BenchmarkApiServerTests(LiveServerTestCase):
+    """Test the benchmark_api command against a server."""
+
+    def test_benchmark_api_over_http(self):
+        """Test requests are sent to the server at --url."""
+        call_command('seed_data', users=2, recipes=5, stdout=StringIO())
+        out = StringIO()
+
+        call_command('benchmark_api', requests=4, concurrency=2,
+                     scenarios='list,create', url=self.live_server_url,
+                     stdout=out)
+
+        output = out.getvalue()
+        results = json.loads(output[output.index('{'):])
+        for result in results['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries_per_request'], 0)
+        self.assertFalse(Tag.objects.filter(name='benchmark').exists())
@@ -0,0 +1,262 @@
+"""
+Tests for the database backend with health checks and pooling.
+"""
+from io import StringIO
+import json
+import threading
+
+import psycopg2
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import pool as pools
+
+DB_STATS_URL = reverse('core:db-stats')
+
+
+def terminate(pid):
+    """Close a connection from the server side."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the connection pool."""
+    databases = {'default'}
+
+    def setUp(self):
+        params = connection.get_connection_params()
+        self.connect = lambda: psycopg2.connect(**params)
+        self.pool = pools.ConnectionPool('test', size=2, timeout=0.1)
+        self.addCleanup(self.pool.close)
+        self.stats = pools.stats.copy()
+
+    def _counted(self, event):
+        return (pools.stats - self.stats)[f'test:{event}']
+
+    def test_released_connection_reused(self):
+        """Test a released connection is handed out again."""
+        conn = self.pool.acquire(self.connect)
+        self.pool.release(conn)
+
+        self.assertIs(self.pool.acquire(self.connect), conn)
+        self.assertEqual(self._counted('connects'), 1)
+        self.assertEqual(self._counted('reuses'), 1)
+
+    def test_open_transaction_rolled_back(self):
+        """Test a connection is released without its transaction."""
+        conn = self.pool.acquire(self.connect)
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.pool.release(conn)
+
+        self.assertEqual(conn.info.transaction_status,
+                         psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def test_pool_size_bounded(self):
+        """Test acquiring from a pool in use times out."""
+        conns = [self.pool.acquire(self.connect) for _ in range(2)]
+
+        with self.assertRaises(psycopg2.OperationalError):
+            self.pool.acquire(self.connect)
+
+        self.assertEqual(self._counted('timeouts'), 1)
+        self.pool.release(conns[0])
+        self.assertIs(self.pool.acquire(self.connect), conns[0])
+        for conn in conns:
+            self.pool.release(conn)
+
+    def test_closed_connection_discarded(self):
+        """Test a connection closed while in use is not pooled."""
+        conn = self.pool.acquire(self.connect)
+        conn.close()
+        self.pool.release(conn)
+
+        self.assertEqual(self.pool.idle, 0)
+        self.assertEqual(self._counted('discards'), 1)
+
+    def test_broken_idle_connection_replaced(self):
+        """Test an idle connection failing the check is replaced."""
+        conn = self.pool.acquire(self.connect)
+        self.pool.release(conn)
+        terminate(conn.get_backend_pid())
+
+        new_conn = self.pool.acquire(self.connect, pools.ping)
+
+        self.assertIsNot(new_conn, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(self._counted('health_check_failures'), 1)
+        self.pool.release(new_conn)
+
+    def test_prewarm(self):
+        """Test prewarming opens connections up to the pool size."""
+        self.pool.prewarm(5, self.connect)
+        self.pool.prewarm(5, self.connect)
+
+        self.assertEqual(self.pool.idle, 2)
+        self.assertEqual(self._counted('connects'), 2)
+
+
+class PooledWrapperTests(SimpleTestCase):
+    """Test connections of the backend go back to the pool."""
+    databases = {'default'}
+
+    def _settings(self):
+        # Another application name, for a pool of its own.
+        return {
+            **connection.settings_dict,
+            'CONN_MAX_AGE': 60,
+            'OPTIONS': {'application_name': 'pooled'},
+            'POOL': {'SIZE': 2, 'TIMEOUT': 2},
+        }
+
+    def _pool(self, settings):
+        wrapper = type(connections['default'])(settings)
+        pool = wrapper._get_pool(wrapper.get_connection_params())
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_released_when_request_finishes(self):
+        """Test a persistent connection is pooled between requests."""
+        settings = self._settings()
+        pool = self._pool(settings)
+        wrapper = type(connections['default'])(settings)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        # As on request_finished.
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(pool.idle, 1)
+
+    def test_released_when_thread_exits(self):
+        """Test threads exiting without closing their connection do not
+        block more threads than the pool size."""
+        settings = self._settings()
+        pool = self._pool(settings)
+        errors = []
+
+        def query():
+            # Like a request thread of a threaded server, which keeps
+            # its connection until it exits.
+            wrapper = type(connections['default'])(settings)
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(pool.idle, 2)
+
+
+class HealthCheckTests(TestCase):
+    """Test persistent connections are checked before being used."""
+
+    def _wrapper(self, **settings):
+        # A second connection to the test database, not the one of the
+        # test case.
+        wrapper = type(connections['default'])(
+            {**connection.settings_dict, 'POOL': None, **settings},
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def _start_request(self, wrapper):
+        """Run the checks of request_started on a connection."""
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_broken_connection_replaced(self):
+        """Test a request reconnects if its connection was closed."""
+        wrapper = self._wrapper(CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        pid = wrapper.connection.get_backend_pid()
+        terminate(pid)
+        failures = pools.stats['default:health_check_failures']
+
+        self._start_request(wrapper)
+
+        self.assertNotEqual(wrapper.connection.get_backend_pid(), pid)
+        self.assertEqual(pools.stats['default:health_check_failures'],
+                         failures + 1)
+
+    def test_without_health_checks_query_fails(self):
+        """Test a closed connection fails the request without checks."""
+        wrapper = self._wrapper(CONN_HEALTH_CHECKS=False)
+        wrapper.ensure_connection()
+        terminate(wrapper.connection.get_backend_pid())
+
+        with self.assertRaises(Exception):
+            self._start_request(wrapper)
+
+    def test_checked_once_per_request(self):
+        """Test only the first query of a request reuses and checks the
+        connection."""
+        wrapper = self._wrapper(CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        reuses = pools.stats['default:persistent_reuses']
+
+        self._start_request(wrapper)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        self.assertEqual(pools.stats['default:persistent_reuses'], reuses + 1)
+
+
+class DatabaseStatsViewTests(TestCase):
+    """Test the connection stats endpoint."""
+
+    def test_db_stats_requires_staff(self):
+        """Test the connection stats are only available to staff users."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(DB_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = client.get(DB_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(key.count(':') == 1 for key in res.data))
+
+
+class BenchmarkConnectionsTests(TransactionTestCase):
+    """Test the connection benchmark command."""
+
+    def test_benchmark_connections(self):
+        """Test each mode is measured and the benchmark data removed."""
+        out = StringIO()
+
+        call_command('benchmark_connections', requests=8, concurrency=2,
+                     stdout=out)
+
+        output = out.getvalue()
+        results = json.loads(output[output.index('{'):])
+        self.assertEqual(set(results),
+                         {'new_connection', 'persistent', 'pooled'})
+        # At least one per request, more when reads go to a replica.
+        self.assertGreaterEqual(results['new_connection']['connects'], 8)
+        self.assertEqual(results['new_connection']['reuses'], 0)
+        self.assertLess(results['persistent']['connects'], 8)
+        self.assertLess(results['pooled']['connects'], 8)
+        self.assertFalse(get_user_model().objects.exists())
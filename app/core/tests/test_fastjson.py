@@ -0,0 +1,195 @@
+"""
+Tests for the orjson renderer and parser.
+"""
+import datetime
+from decimal import Decimal
+import io
+from unittest.mock import patch
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from core import fastjson
+from core.models import Recipe, Tag
+
+
+@override_settings(API_JSON_BACKEND='orjson')
+class JSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer renders like DRF's."""
+
+    def assertSameJSON(self, data, accepted_media_type=None):
+        expected = renderers.JSONRenderer().render(data, accepted_media_type)
+
+        content = fastjson.JSONRenderer().render(data, accepted_media_type)
+
+        self.assertEqual(content, expected)
+
+    def test_native_types(self):
+        """Test the types orjson writes itself render the same."""
+        self.assertSameJSON({
+            'id': 1,
+            'title': 'Crème brûlée \U0001f36e "quoted" \\ \n',
+            'ratio': 0.1,
+            'big': 2 ** 63 - 1,
+            'ok': True,
+            'none': None,
+            'tags': [{'id': 2, 'name': 'Vegan'}],
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        })
+
+    def test_float_notation(self):
+        """Test floats are written in orjson's shortest form, which reads
+        back as the same numbers."""
+        data = {'small': 1.5e-7, 'large': 1e16, 'ratio': 0.1}
+        expected = renderers.JSONRenderer().render(data)
+
+        content = fastjson.JSONRenderer().render(data)
+
+        self.assertEqual(expected,
+                         b'{"small":1.5e-07,"large":1e+16,"ratio":0.1}')
+        self.assertEqual(content, b'{"small":1.5e-7,"large":1e16,"ratio":0.1}')
+        self.assertEqual(fastjson.orjson.loads(content),
+                         fastjson.orjson.loads(expected))
+
+    def test_encoder_types(self):
+        """Test the types of DRF's encoder render the same."""
+        tz = datetime.timezone(datetime.timedelta(hours=2))
+        self.assertSameJSON({
+            'price': Decimal('5.25'),
+            'utc': datetime.datetime(
+                2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'local': datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=tz),
+            'naive': datetime.datetime(2024, 1, 2, 3, 4, 5, 6),
+            'date': datetime.date(2024, 1, 2),
+            'time': datetime.time(3, 4, 5, 678901),
+            'duration': datetime.timedelta(minutes=90),
+            'lazy': gettext_lazy('This field is required.'),
+            'bytes': b'abc',
+            'set': (1, 2),
+        })
+
+    def test_line_separators_escaped(self):
+        """Test U+2028 and U+2029 are escaped as by DRF."""
+        self.assertSameJSON({'title': 'a b c'})
+
+    def test_fallback(self):
+        """Test what orjson cannot write is rendered by DRF."""
+        self.assertSameJSON({'big': 2 ** 70})
+        self.assertSameJSON({1: 'non string key'})
+        self.assertSameJSON([{'id': 1}], 'application/json; indent=4')
+        self.assertEqual(fastjson.JSONRenderer().render(None), b'')
+
+    def test_unknown_type_raises(self):
+        """Test unknown types raise like with DRF."""
+        with self.assertRaises(TypeError):
+            fastjson.JSONRenderer().render({'object': object()})
+
+    @override_settings(API_JSON_BACKEND='stdlib')
+    def test_stdlib_backend(self):
+        """Test the json module is used when configured."""
+        with self.assertRaises(TypeError):
+            fastjson.JSONRenderer().render({1: object()})
+        self.assertFalse(fastjson.use_orjson())
+
+    @override_settings(API_JSON_BACKEND='stdlib')
+    def test_backend_of_class(self):
+        """Test a subclass may use its own backend."""
+        class OrjsonRenderer(fastjson.JSONRenderer):
+            backend = 'orjson'
+
+        with patch.object(fastjson.orjson, 'dumps',
+                          wraps=fastjson.orjson.dumps) as dumps:
+            fastjson.JSONRenderer().render({'title': 'Soup'})
+            self.assertFalse(dumps.called)
+
+            content = OrjsonRenderer().render({'title': 'Soup'})
+
+        self.assertTrue(dumps.called)
+        self.assertEqual(content, b'{"title":"Soup"}')
+
+    @override_settings(API_JSON_BACKEND='simdjson')
+    def test_unknown_backend(self):
+        """Test an unknown backend is refused."""
+        with self.assertRaises(ImproperlyConfigured):
+            fastjson.use_orjson()
+
+
+@override_settings(API_JSON_BACKEND='orjson')
+class JSONParserTests(SimpleTestCase):
+    """Test the orjson parser parses like DRF's."""
+
+    def parse(self, parser_class, content):
+        return parser_class().parse(io.BytesIO(content))
+
+    def test_same_data(self):
+        """Test documents parse the same."""
+        content = '{"title": "Crème", "price": "5.25", "ratio": 1.5, ' \
+                  '"tags": [{"name": "Vegan"}], "big": 123456789012345678901' \
+                  '234567890, "huge": 18446744073709551616, "low": ' \
+                  '-9223372036854775809, "none": null}'.encode()
+
+        self.assertEqual(self.parse(fastjson.JSONParser, content),
+                         self.parse(parsers.JSONParser, content))
+
+    def test_same_errors(self):
+        """Test invalid documents raise the errors of DRF's parser."""
+        for content in [b'{"title": ', b'{"ratio": NaN}', b'\xff']:
+            with self.assertRaises(ParseError) as expected:
+                self.parse(parsers.JSONParser, content)
+
+            with self.assertRaises(ParseError) as raised:
+                self.parse(fastjson.JSONParser, content)
+
+            self.assertEqual(str(raised.exception),
+                             str(expected.exception))
+
+
+class JSONBackendApiTests(TestCase):
+    """Test the API renders the same with either backend."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(20):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Crème brûlée {i}', time_minutes=i,
+                price=Decimal('5.25'), link='https://example.com/ ')
+            recipe.tags.add(Tag.objects.create(
+                user=self.user, name=f'Dessert {i}'))
+
+    def test_recipe_list_same_content(self):
+        """Test a recipe list is the same with orjson and stdlib."""
+        url = reverse('recipe:recipe-list')
+        with override_settings(API_JSON_BACKEND='stdlib'):
+            expected = self.client.get(url).content
+
+        with override_settings(API_JSON_BACKEND='orjson'):
+            content = self.client.get(url).content
+
+        self.assertEqual(content, expected)
+
+    @override_settings(API_JSON_BACKEND='orjson')
+    def test_create_recipe_parsed(self):
+        """Test JSON requests are parsed."""
+        payload = {
+            'title': 'Stew',
+            'time_minutes': 60,
+            'price': '9.00',
+            'tags': [{'name': 'Dinner'}],
+        }
+
+        res = self.client.post(
+            reverse('recipe:recipe-list'), payload, format='json')
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json()['tags'][0]['name'], 'Dinner')
@@ -0,0 +1,154 @@
+"""
+Tests for the request metrics.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('core:metrics')
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics of a response by name."""
+    return {
+        entry.split(';')[0].strip(): entry
+        for entry in response['Server-Timing'].split(',')
+    }
+
+
+class RequestMetricsTests(TestCase):
+    """Test requests are measured."""
+
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('2.00'))
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+    def test_server_timing_header(self):
+        """Test the queries of a request are counted in its header."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        timing = server_timing(res)
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        self.assertEqual(set(timing), {'db', 'serialize', 'total'})
+
+    def test_histograms_by_view_and_action(self):
+        """Test requests are recorded under their view and action."""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        self.client.get('/api/recipe/missing/')
+
+        text = metrics.render_prometheus()
+
+        labels = 'view="recipe:recipe-list",action="list"'
+        self.assertIn(f'api_request_duration_seconds_count{{{labels}}} 2',
+                      text)
+        self.assertIn(f'api_request_queries_count{{{labels}}} 2', text)
+        self.assertIn(
+            'api_request_duration_seconds_count'
+            '{view="unresolved",action="get"} 1',
+            text)
+
+    def test_serializer_time_recorded(self):
+        """Test the time spent in serializers is recorded once."""
+        self.client.get(RECIPES_URL)
+
+        (labels, (counts, total)), = \
+            metrics.request_serializer_duration._series.items()
+        self.assertEqual(labels, ('recipe:recipe-list', 'list'))
+        self.assertEqual(sum(counts), 1)
+        self.assertGreater(total, 0)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_metrics_disabled(self):
+        """Test requests are not measured when disabled."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertFalse(metrics.request_duration._series)
+
+    async def test_async_requests_measured(self):
+        """Test queries run on other threads count under ASGI."""
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+
+        res = await AsyncClient().get(
+            RECIPES_URL, authorization=f'Token {token.key}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('desc="0 queries"', server_timing(res)['db'])
+
+    def test_metrics_endpoint(self):
+        """Test the metrics are served to staff users only."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'# TYPE api_request_duration_seconds histogram',
+                      res.content)
+        self.assertIn(b'db_connection_events_total', res.content)
+
+    def test_metrics_endpoint_scrape_token(self):
+        """Test the metrics are served with the scrape token, if set."""
+        client = APIClient()
+        res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with override_settings(METRICS_TOKEN='secret'):
+            res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+            res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'# TYPE api_request_duration_seconds histogram',
+                      res.content)
+
+
+class HistogramTests(SimpleTestCase):
+    """Test the Prometheus histograms."""
+
+    def test_buckets_cumulative(self):
+        """Test bucket counts include the smaller buckets."""
+        histogram = metrics.Histogram('test', 'Test.', (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(('view', 'list'), value)
+
+        lines = histogram.render()
+
+        labels = 'view="view",action="list"'
+        self.assertIn(f'test_bucket{{{labels},le="1"}} 2', lines)
+        self.assertIn(f'test_bucket{{{labels},le="5"}} 3', lines)
+        self.assertIn(f'test_bucket{{{labels},le="+Inf"}} 4', lines)
+        self.assertIn(f'test_sum{{{labels}}} 14.5', lines)
+        self.assertIn(f'test_count{{{labels}}} 4', lines)
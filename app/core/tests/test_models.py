@@ -7,7 +7,6 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 
 from core import models
-from unittest.mock import patch
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -91,11 +90,7 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(ingredient), ingredient.name)
 
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
+    def test_recipe_file_path(self):
         """Test that image is saved in the correct location."""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, 'example.jpg')
-        exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path)
+        self.assertEqual(file_path, 'uploads/recipe/example.jpg')
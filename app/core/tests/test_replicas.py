@@ -0,0 +1,163 @@
+"""
+Tests for routing reads to the database replicas.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import replicas
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+def create_user(email='user@example.com'):
+    return get_user_model().objects.create_user(email, 'testpass123')
+
+
+# The default database stands in for a replica, so that reads routed to
+# it can be told apart from reads left to the default routing (None).
+# Only while routing, or the database would not be flushed between tests.
+ROUTE_TO_DEFAULT = override_settings(DATABASE_REPLICAS=['default'])
+
+# Alias of the stand-in replica when none is configured.
+MIRROR = 'replica_mirror'
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test which reads the router sends to the replicas."""
+    databases = '__all__'
+
+    def setUp(self) -> None:
+        replicas.local_pins.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(user=self.user, title='Soup',
+                              time_minutes=5, price=Decimal('2.00'))
+
+    def _routed(self, method, url, data=None):
+        """Make a request, returning where each of its reads was sent."""
+        routed = []
+        db_for_read = replicas.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            routed.append(db_for_read(router, model, **hints))
+            return routed[-1]
+
+        with ROUTE_TO_DEFAULT, \
+                patch.object(replicas.ReplicaRouter, 'db_for_read', record):
+            getattr(self.client, method)(url, data, format='json')
+        return routed
+
+    def test_safe_requests_read_from_replica(self):
+        """Test GET requests of the API views read from a replica."""
+        for url in [RECIPES_URL, TAGS_URL]:
+            routed = self._routed('get', url)
+
+            self.assertTrue(routed)
+            self.assertEqual(set(routed), {'default'})
+
+    def test_unsafe_requests_read_from_primary(self):
+        """Test the reads of a write request stay on the primary."""
+        routed = self._routed('post', RECIPES_URL, {
+            'title': 'Stew', 'time_minutes': 60, 'price': '9.00',
+            'tags': [{'name': 'Dinner'}],
+        })
+
+        self.assertTrue(routed)
+        self.assertEqual(set(routed), {None})
+
+    def test_writes_pin_user_to_primary(self):
+        """Test a user reads from the primary for a while after writing,
+        and other users do not."""
+        self._routed('patch', ME_URL, {'name': 'New name'})
+
+        self.assertEqual(set(self._routed('get', RECIPES_URL)), {None})
+
+        self.client.force_authenticate(create_user('other@example.com'))
+        self.assertEqual(set(self._routed('get', RECIPES_URL)), {'default'})
+
+    def test_pin_expires(self):
+        """Test the pin to the primary expires."""
+        self._routed('patch', ME_URL, {'name': 'New name'})
+
+        with patch('core.cache.time.monotonic',
+                   return_value=10 ** 9):
+            routed = self._routed('get', RECIPES_URL)
+
+        self.assertEqual(set(routed), {'default'})
+
+    def test_reads_outside_requests_and_in_transactions(self):
+        """Test reads outside API requests, or in a transaction, stay on
+        the primary."""
+        router = replicas.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Recipe))
+
+        token = replicas._read_from_replica.set(True)
+        try:
+            with ROUTE_TO_DEFAULT:
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+                with transaction.atomic():
+                    self.assertIsNone(router.db_for_read(Recipe))
+        finally:
+            replicas._read_from_replica.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_replicas_not_migrated(self):
+        """Test migrations are not run on the replicas."""
+        router = replicas.ReplicaRouter()
+
+        self.assertIsNone(router.allow_migrate('default', 'core'))
+        self.assertFalse(router.allow_migrate('replica_1', 'core'))
+
+
+class ReplicaDatabaseTests(TransactionTestCase):
+    """Test reads reach a replica, which mirrors the default database in
+    tests. Without a configured replica, a second connection to the
+    default database stands in for one."""
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        if not settings.DATABASE_REPLICAS:
+            connections.databases[MIRROR] = {
+                **connections['default'].settings_dict,
+                'TEST': {'MIRROR': 'default'},
+            }
+            cls.addClassCleanup(cls._remove_mirror)
+        super().setUpClass()
+
+    @classmethod
+    def _remove_mirror(cls):
+        connections[MIRROR].close()
+        del connections[MIRROR]
+        del connections.databases[MIRROR]
+
+    def test_list_queries_replica(self):
+        """Test listing recipes queries a replica and not the primary."""
+        user = create_user()
+        Recipe.objects.create(user=user, title='Soup',
+                              time_minutes=5, price=Decimal('2.00'))
+        client = APIClient()
+        client.force_authenticate(user)
+        alias = (settings.DATABASE_REPLICAS or [MIRROR])[0]
+
+        with override_settings(DATABASE_REPLICAS=[alias]), \
+                CaptureQueriesContext(connections[alias]) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            res = client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 1)
+        self.assertTrue(replica.captured_queries)
+        self.assertFalse(primary.captured_queries)
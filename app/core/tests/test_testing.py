@@ -0,0 +1,141 @@
+"""
+Tests for the query count regression guard.
+"""
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Tag
+from core.testing import (
+    QueryBaselineMixin,
+    api_endpoints,
+    fingerprint,
+    load_baseline,
+)
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test query fingerprints."""
+
+    def test_values_removed(self):
+        """Test queries differing by their values have one fingerprint."""
+        self.assertEqual(
+            fingerprint(
+                'SELECT "core_tag"."id" FROM "core_tag" '
+                'WHERE ("core_tag"."name" = \'it\'\'s\' '
+                'AND "core_tag"."id" IN (1, 2, 3)) LIMIT 21'),
+            'SELECT "core_tag"."id" FROM "core_tag" '
+            'WHERE ("core_tag"."name" = ? AND "core_tag"."id" IN (...)) '
+            'LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SAVEPOINT "s1404_x12"'),
+                         'SAVEPOINT "s?"')
+        self.assertEqual(
+            fingerprint('DECLARE "_django_curs_1397_sync_12" NO SCROLL '
+                        'CURSOR WITHOUT HOLD FOR SELECT 1'),
+            'DECLARE "_django_curs_?" NO SCROLL CURSOR WITHOUT HOLD FOR '
+            'SELECT ?')
+
+    def test_rows_and_casts_removed(self):
+        """Test inserts differing by their number of rows, or a list by
+        its number of values, have one fingerprint."""
+        one_row = fingerprint(
+            'INSERT INTO "core_tag" ("name", "updated_at") '
+            "VALUES ('a', '2024-01-02'::timestamptz) "
+            'RETURNING "core_tag"."id"')
+        rows = fingerprint(
+            'INSERT INTO "core_tag" ("name", "updated_at") '
+            "VALUES ('a', '2024-01-02'::timestamp with time zone), "
+            "('b', '2024-01-02'::timestamp with time zone) "
+            'RETURNING "core_tag"."id"')
+
+        self.assertEqual(one_row, rows)
+        self.assertEqual(fingerprint('WHERE "id" IN (1)'),
+                         fingerprint('WHERE "id" IN (1, 2)'))
+
+
+class QueryBaselineCoverageTests(SimpleTestCase):
+    """Test the baseline covers the API."""
+
+    def test_every_endpoint_has_baseline(self):
+        """Test every method and route of the API has a baseline."""
+        covered = {
+            entry.get('endpoint') for entry in load_baseline().values()
+        }
+
+        missing = [endpoint for endpoint in api_endpoints()
+                   if endpoint not in covered]
+
+        self.assertEqual(missing, [], 'Add query count tests for these.')
+
+
+@patch.dict(os.environ, {'QUERY_BASELINE_UPDATE': '0'})
+class QueryBaselineMixinTests(QueryBaselineMixin, TestCase):
+    """Test requests are checked against the baseline."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        handle, self.query_baseline_path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.query_baseline_path)
+        self.write_baseline({})
+
+    def write_baseline(self, baseline):
+        with open(self.query_baseline_path, 'w') as baseline_file:
+            json.dump(baseline, baseline_file)
+
+    def list_tags(self):
+        return list(Tag.objects.filter(user=self.user).values_list(
+            'id', flat=True))
+
+    def add_tags(self, count):
+        for _ in range(count):
+            Tag.objects.create(
+                user=self.user, name=f'Tag {Tag.objects.count()}')
+
+    def list_tags_per_row(self):
+        return [Tag.objects.get(id=tag_id) for tag_id in self.list_tags()]
+
+    def test_matching_baseline(self):
+        """Test requests making their baseline queries pass."""
+        self.write_baseline({'tags': {'queries': 1, 'fingerprints': [
+            'SELECT "core_tag"."id" FROM "core_tag" '
+            'WHERE "core_tag"."user_id" = ?',
+        ]}})
+
+        tags = self.assertQueriesMatchBaseline(
+            'tags', self.list_tags, add_rows=self.add_tags)
+
+        self.assertEqual(len(tags), 3)
+
+    def test_more_queries_fail(self):
+        """Test requests making more queries than their baseline fail."""
+        self.write_baseline({'tags': {'queries': 0, 'fingerprints': []}})
+
+        with self.assertRaisesMessage(AssertionError, '1 queries, baseline 0'):
+            self.assertQueriesMatchBaseline('tags', self.list_tags)
+
+    def test_missing_baseline_fails(self):
+        """Test requests without a baseline fail."""
+        with self.assertRaisesMessage(AssertionError, 'no query baseline'):
+            self.assertQueriesMatchBaseline('tags', self.list_tags)
+
+    def test_queries_growing_with_rows_fail(self):
+        """Test requests querying per row fail."""
+        with self.assertRaisesMessage(AssertionError, 'grow with rows'):
+            self.assertQueriesMatchBaseline(
+                'tags', self.list_tags_per_row, add_rows=self.add_tags)
+
+    @patch.dict(os.environ, {'QUERY_BASELINE_UPDATE': '1'})
+    def test_update_baseline(self):
+        """Test the baseline is recorded when updating."""
+        self.addCleanup(self._recorded_queries.clear)
+        self.assertQueriesMatchBaseline('tags', self.list_tags)
+
+        self.assertEqual(self._recorded_queries['tags']['queries'], 1)
+        self.assertEqual(load_baseline(self.query_baseline_path), {})
@@ -0,0 +1,14 @@
+"""
+URL mappings for the statistics of the API processes.
+"""
+from django.urls import path
+
+from core import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('db-stats/', views.DatabaseStatsView.as_view(), name='db-stats'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+]
@@ -0,0 +1,56 @@
+"""
+Views for the statistics of the API processes.
+"""
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+
+from django.http import HttpResponse
+
+from rest_framework import views
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from core.db.pool import pool_stats, stats as db_stats
+from core.metrics import HasMetricsToken, render_prometheus
+from recipe.cache import stats as cache_stats
+
+
+class CacheStatsView(views.APIView):
+    """Report the response cache hits and misses of this process."""
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request):
+        return Response({
+            'hits': cache_stats['hits'],
+            'misses': cache_stats['misses'],
+        })
+
+
+class MetricsView(views.APIView):
+    """Report the request metrics and the connection and cache counters
+    of this process, in the Prometheus text format."""
+    permission_classes = [IsAdminUser | HasMetricsToken]
+
+    @extend_schema(responses={200: OpenApiTypes.STR})
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus([
+                ('db_connection_events_total',
+                 'Database connections opened, reused and discarded.',
+                 db_stats, ['alias', 'event']),
+                ('response_cache_requests_total',
+                 'Response cache hits and misses.',
+                 cache_stats, ['result']),
+            ]),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+class DatabaseStatsView(views.APIView):
+    """Report the database connections opened and reused by this
+    process."""
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request):
+        return Response(pool_stats())
@@ -0,0 +1,101 @@
+"""
+Per-user response cache for the recipe API.
+
+Cached responses are keyed on the user, the endpoint, the normalized query
+parameters and the user's data version. Any change to the user's recipes,
+tags or ingredients bumps the version (see recipe.signals), which makes all
+of their cached responses unreachable at once instead of deleting them one
+by one; they simply expire. It also bumps the version stored in the
+database, which validates conditional GETs (see recipe.conditional).
+"""
+from collections import Counter
+from functools import wraps
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import DataVersion
+
+# Hits and misses of this process.
+stats = Counter()
+
+
+def _cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def get_data_version(user_id):
+    """Return the current data version of a user."""
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Start from the clock rather than 1, so that a version evicted
+        # from the cache never comes back to a value already used.
+        cache.add(_version_key(user_id), time.time_ns(), None)
+        version = cache.get(_version_key(user_id), time.time_ns())
+    return version
+
+
+def _bump(user_id):
+    cache = _cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def bump_data_version(user_id):
+    """Invalidate the cached responses and validators of a user.
+
+    The cached version is bumped right away and again once the
+    transaction commits, so a response computed from data that was not
+    committed yet is never cached under the new version. The stored one
+    is bumped in the transaction."""
+    DataVersion.objects.bump(user_id)
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def response_cache_key(request):
+    """Return the cache key of a GET request."""
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    digest = hashlib.sha256(
+        repr((request.get_host(), request.path, params)).encode()
+    ).hexdigest()
+    version = get_data_version(request.user.id)
+    return f'recipe:response:{request.user.id}:{version}:{digest}'
+
+
+def cache_per_user(view_method):
+    """Cache the successful responses of a viewset action per user."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        cache = _cache()
+        key = response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            stats['hits'] += 1
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        stats['misses'] += 1
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
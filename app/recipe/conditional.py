@@ -0,0 +1,109 @@
+"""
+Conditional GET (ETag / Last-Modified) support for the recipe API.
+
+Validators are read in a single query, so a client holding a current
+copy gets a 304 without the list or detail queryset being evaluated or
+serialized. The list's come from the data version of the user, which
+every change bumps, deletes included (see core.models.DataVersion). A
+recipe's are computed from the updated_at columns of the recipe, its
+tags and ingredients, and their counts.
+"""
+from functools import wraps
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.models import DataVersion, Recipe, Tag, Ingredient
+
+
+def _aggregates(queryset, group_by, prefix):
+    """Return count and latest update subqueries of a queryset."""
+    rows = queryset.order_by().values(group_by)
+    return {
+        f'{prefix}_count': Subquery(
+            rows.annotate(total=Count('id')).values('total')),
+        f'{prefix}_modified': Subquery(
+            rows.annotate(latest=Max('updated_at')).values('latest')),
+    }
+
+
+def _version(row):
+    """Return the validators (etag, last_modified) of an aggregate row."""
+    digest = hashlib.sha256(repr(sorted(row.items())).encode()).hexdigest()
+    modified = [value for key, value in row.items()
+                if key.endswith('_modified') and value is not None]
+    return digest, max(modified, default=None)
+
+
+def user_recipes_version(request, **kwargs):
+    """Return the validators of all the recipe data of the user."""
+    row = DataVersion.objects.filter(user=request.user.pk)\
+        .values('version', 'modified_at').first()
+    if row is None:
+        # Unchanged since data versions were introduced.
+        row = {'version': 0, 'modified_at': None}
+    row['data_modified'] = row.pop('modified_at')
+    return _version(row)
+
+
+def recipe_version(request, pk=None, **kwargs):
+    """Return the validators of one recipe of the user, or None if it is
+    not found."""
+    try:
+        recipes = Recipe.objects.filter(pk=pk, user=request.user)
+    except (TypeError, ValueError):
+        return None
+
+    row = recipes.annotate(
+        **_aggregates(Tag.objects.filter(recipe=OuterRef('pk')),
+                      'recipe', 'tags'),
+        **_aggregates(Ingredient.objects.filter(recipe=OuterRef('pk')),
+                      'recipe', 'ingredients'),
+    ).values(
+        'updated_at',
+        'tags_count', 'tags_modified',
+        'ingredients_count', 'ingredients_modified',
+    ).first()
+    if row is None:
+        return None
+
+    row['recipe_modified'] = row.pop('updated_at')
+    return _version(row)
+
+
+def conditional_get(get_version):
+    """Answer conditional GETs of a viewset action from its validators.
+
+    get_version(request, **kwargs) returns (digest, last_modified), or
+    None to skip straight to the action."""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            version = get_version(request, **kwargs)
+            if version is None:
+                return view_method(self, request, *args, **kwargs)
+
+            digest, last_modified = version
+            # The query string is part of the representation.
+            query = request.META.get('QUERY_STRING', '')
+            etag = quote_etag(hashlib.sha256(
+                f'{digest}:{query}'.encode()).hexdigest()[:32])
+            # Whole seconds, like the HTTP date clients send back.
+            timestamp = int(last_modified.timestamp()) \
+                if last_modified else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+            return response
+
+        return wrapper
+
+    return decorator
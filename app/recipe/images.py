@@ -0,0 +1,200 @@
+"""
+Background processing of uploaded recipe images.
+
+Uploads are stored as is and queued as an ImageJob. The process_images
+command then decodes each image once, applies and strips its EXIF data,
+and stores resized WebP and JPEG renditions. The full size JPEG replaces
+the original upload, which is deleted.
+
+Renditions are named after the hash of their content, so they are shared
+between recipes and can be served with immutable cache headers. A file is
+only deleted once no recipe refers to it, holding the lock of its name
+(see core.storage.lock_file).
+
+A job still processing once its lease expired was claimed by a worker
+that stopped, and is claimed again.
+"""
+from datetime import timedelta
+from io import BytesIO
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import ImageJob, ImageStatus, Recipe
+from core.storage import content_hashed_storage, lock_file
+
+# Directory of the renditions in the media storage.
+RENDITIONS_DIR = os.path.join('uploads', 'recipe', 'renditions')
+
+# Longest side, in pixels, of each rendition.
+RENDITION_SIZES = {
+    'thumb': 200,
+    'medium': 800,
+    'full': 2000,
+}
+# Pillow format and save options of each output format.
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+# Failed jobs are retried until they were attempted this many times.
+MAX_ATTEMPTS = 3
+# Time a worker has to process a job before others may claim it again.
+JOB_LEASE = timedelta(minutes=10)
+
+
+def enqueue_image(recipe):
+    """Queue the current image of a recipe for processing."""
+    recipe.image_status = ImageStatus.PENDING
+    recipe.save(update_fields=['image_status', 'updated_at'])
+    return ImageJob.objects.create(recipe=recipe, source=recipe.image.name)
+
+
+def render_image(file):
+    """Return the encoded renditions of an image file, by size and format.
+
+    The image is decoded once. Its EXIF orientation is applied to the
+    pixels and no metadata is written to the renditions."""
+    with Image.open(file) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    renditions = {}
+    # From the largest size down, so each resize starts from a smaller
+    # image than the original.
+    for size, max_side in sorted(RENDITION_SIZES.items(),
+                                 key=lambda item: -item[1]):
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        renditions[size] = {}
+        for fmt, (pil_format, options) in RENDITION_FORMATS.items():
+            output = BytesIO()
+            image.save(output, pil_format, **options)
+            renditions[size][fmt] = output.getvalue()
+
+    return renditions
+
+
+def claim_next_job():
+    """Mark the oldest pending job as processing and return it.
+
+    Jobs whose lease expired are claimed again, or failed once out of
+    attempts. Rows locked by other workers are skipped, so any number of
+    workers can poll the table concurrently."""
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            job = ImageJob.objects.select_for_update(skip_locked=True)\
+                .filter(
+                    Q(status=ImageStatus.PENDING)
+                    | Q(status=ImageStatus.PROCESSING,
+                        claimed_at__lt=now - JOB_LEASE)
+                ).order_by('id').first()
+            if job is None:
+                return None
+            if job.attempts >= MAX_ATTEMPTS:
+                _fail_job(job, 'The worker stopped while processing.')
+                continue
+            job.status = ImageStatus.PROCESSING
+            job.attempts += 1
+            job.claimed_at = now
+            job.save(update_fields=[
+                'status', 'attempts', 'claimed_at', 'updated_at'])
+            return job
+
+
+def _store_renditions(renditions):
+    """Save renditions under content-hashed names and return the names.
+
+    Identical renditions, e.g. of the same photo uploaded to several
+    recipes, are stored once."""
+    names = {}
+    for size, formats in renditions.items():
+        for fmt, content in formats.items():
+            names.setdefault(size, {})[fmt] = content_hashed_storage.save(
+                os.path.join(RENDITIONS_DIR, f'{size}.{fmt}'),
+                ContentFile(content),
+            )
+    return names
+
+
+def _is_referenced(name):
+    """Return whether any recipe still uses a stored file."""
+    references = Q(image=name)
+    for size in RENDITION_SIZES:
+        for fmt in RENDITION_FORMATS:
+            references |= Q(image_renditions__contains={size: {fmt: name}})
+    return Recipe.objects.filter(references).exists()
+
+
+def delete_unused_files(names):
+    """Delete the files no recipe uses anymore."""
+    for name in sorted(set(filter(None, names))):
+        with transaction.atomic():
+            lock_file(name)
+            if not _is_referenced(name):
+                content_hashed_storage.delete(name)
+
+
+def _finish_job(job, status, error=''):
+    # A queryset update, as the job is gone if its recipe was deleted.
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status, error=error, updated_at=timezone.now())
+
+
+def _fail_job(job, error):
+    """Fail a job, and the image of its recipe unless replaced since."""
+    _finish_job(job, ImageStatus.FAILED, error)
+    for recipe in Recipe.objects.filter(pk=job.recipe_id, image=job.source):
+        recipe.image_status = ImageStatus.FAILED
+        recipe.save(update_fields=['image_status', 'updated_at'])
+
+
+def _use_renditions(job, renditions):
+    """Store the renditions of a job and set them on its recipe, unless
+    the image was replaced. Returns the recipe and the names it used
+    before, or None and no names."""
+    names = _store_renditions(renditions)
+    recipe = Recipe.objects.select_for_update()\
+        .filter(pk=job.recipe_id, image=job.source).first()
+    if recipe is None:
+        return None, [name for formats in names.values()
+                      for name in formats.values()]
+
+    old_names = [job.source] + [
+        name for formats in recipe.image_renditions.values()
+        for name in formats.values()
+    ]
+    recipe.image.name = names['full']['jpeg']
+    recipe.image_renditions = names
+    recipe.image_status = ImageStatus.DONE
+    recipe.save(update_fields=[
+        'image', 'image_renditions', 'image_status', 'updated_at',
+    ])
+    return recipe, old_names
+
+
+def process_job(job):
+    """Process the image of a claimed job. Returns True on success."""
+    try:
+        with content_hashed_storage.open(job.source, 'rb') as file:
+            renditions = render_image(file)
+        # The files are saved in the transaction referencing them, which
+        # keeps their names locked until then.
+        with transaction.atomic():
+            recipe, unused_names = _use_renditions(job, renditions)
+            _finish_job(job, ImageStatus.DONE)
+    except Exception as exc:
+        with transaction.atomic():
+            if job.attempts >= MAX_ATTEMPTS:
+                _fail_job(job, repr(exc))
+            else:
+                _finish_job(job, ImageStatus.PENDING, repr(exc))
+        return False
+
+    # If the recipe is gone, or a newer upload replaced the image and
+    # has its own job, the new renditions are unused.
+    delete_unused_files(unused_names)
+    return True
@@ -0,0 +1,51 @@
+"""
+Pagination for the recipe API.
+
+Pagination is opt-in: clients that send neither a cursor nor a page size
+keep getting the plain, unpaginated list. Keyset (cursor) pagination is
+used so that fetching a deep page costs the same as fetching the first
+one, instead of scanning and discarding rows like OFFSET does.
+"""
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """Cursor pagination that is only applied when the client asks for it."""
+    page_size = settings.API_PAGE_SIZE
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate only if a cursor or page size was requested."""
+        params = request.query_params
+        if self.cursor_query_param not in params and \
+                self.page_size_query_param not in params:
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeCursorPagination(OptInCursorPagination):
+    """Paginate recipes, newest first, or best match first when
+    searching."""
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """Order search results by rank."""
+        if request.query_params.get('search'):
+            return ('-rank', '-id')
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(OptInCursorPagination):
+    """Paginate tags and ingredients by name, or by popularity."""
+    ordering = ('-name', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        """Order as the view does for the requested ordering."""
+        ordering = request.query_params.get('ordering')
+        if ordering in view.orderings:
+            return view.orderings[ordering]
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,120 @@
+"""
+Streaming parsers for the recipe API.
+
+These parsers do not load the whole request body: they return a generator
+that decodes one item at a time while reading the body, so memory use is
+bounded by the size of a single item. An item that cannot be decoded is
+yielded as a ParseError instance, so callers can report it for that row.
+"""
+import codecs
+import json
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline delimited JSON, one item per line."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return self._iter_lines(stream)
+
+    def _iter_lines(self, stream):
+        # Read up to the limit and a newline.
+        max_line_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        size = None if max_line_size is None else max_line_size + 1
+        while True:
+            line = stream.readline(size)
+            if not line:
+                return
+            if len(line) == size and not line.endswith(b'\n'):
+                yield ParseError(
+                    'JSON parse error - line longer than '
+                    f'{max_line_size} bytes.')
+                return
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield ParseError(f'JSON parse error - {exc}')
+
+
+class JSONArrayStreamParser(BaseParser):
+    """Parse a JSON array, one element at a time."""
+    media_type = 'application/json'
+    chunk_size = 64 * 1024
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return self._iter_items(stream)
+
+    def _iter_items(self, stream):
+        text_decoder = codecs.getincrementaldecoder('utf-8')()
+        json_decoder = json.JSONDecoder()
+        buffer, pos, eof = '', 0, False
+        # An item that does not end, e.g. after a syntax error, would
+        # otherwise buffer the rest of the body.
+        max_item_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+
+        def read_more():
+            """Drop the consumed text and append the next chunk."""
+            nonlocal buffer, pos, eof
+            if max_item_size is not None and \
+                    len(buffer) - pos > max_item_size:
+                raise ParseError(
+                    'JSON parse error - item larger than '
+                    f'{max_item_size} characters.')
+            data = stream.read(self.chunk_size)
+            eof = not data
+            buffer = buffer[pos:] + text_decoder.decode(data, final=eof)
+            pos = 0
+
+        def next_char():
+            """Skip whitespace and return the next character, or ''."""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                read_more()
+
+        def next_item():
+            """Decode the item at the current position."""
+            nonlocal pos
+            while True:
+                try:
+                    item, end = json_decoder.raw_decode(buffer, pos)
+                except ValueError as exc:
+                    if eof:
+                        raise ParseError(f'JSON parse error - {exc}')
+                    read_more()
+                    continue
+                # An item ending with the buffer may be cut short, for
+                # example a number split across two reads.
+                if end == len(buffer) and not eof:
+                    read_more()
+                    continue
+                pos = end
+                return item
+
+        try:
+            if next_char() != '[':
+                raise ParseError('JSON parse error - expected an array.')
+            pos += 1
+            if next_char() == ']':
+                return
+            while True:
+                next_char()
+                yield next_item()
+                char = next_char()
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ParseError('JSON parse error - expected "," or "]".')
+                pos += 1
+        except ParseError as exc:
+            yield exc
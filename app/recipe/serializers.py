@@ -9,11 +9,21 @@ It packages and un-packages data, from and to the server.
 We want to get a JSON version from de database and the model data.
 
 """
+from collections import Counter, defaultdict
+
+from drf_spectacular.utils import extend_schema_field
+
+from django.db import transaction
+
 from rest_framework import serializers
+from core.metrics import TimedSerializerMixin
 from core.models import Recipe, Tag, Ingredient
+from core.storage import content_hashed_storage
+from recipe.cache import bump_data_version
+from recipe.images import RENDITION_FORMATS, RENDITION_SIZES, enqueue_image
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for ingredient objects."""
     class Meta:
         model = Ingredient
@@ -21,7 +31,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
     class Meta:
         model = Tag
@@ -31,7 +41,67 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer for creating many recipes at once."""
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create recipes in bulk, resolving the tags and ingredients of
+        all of them together."""
+        tags = {obj.name: obj for obj in self.child._get_or_create_tags(
+            [tag for item in validated_data for tag in item.get('tags', [])]
+        )}
+        ingredients = {
+            obj.name: obj for obj in self.child._get_or_create_ingredients([
+                ingredient for item in validated_data
+                for ingredient in item.get('ingredients', [])
+            ])
+        }
+
+        recipes = Recipe.objects.bulk_create(
+            Recipe(**{
+                attr: value for attr, value in item.items()
+                if attr not in ('tags', 'ingredients')
+            })
+            for item in validated_data
+        )
+
+        # The through rows are inserted directly, which does not send
+        # m2m_changed signals, so the cache is invalidated and the recipe
+        # counts updated below.
+        TagLink = Recipe.tags.through
+        IngredientLink = Recipe.ingredients.through
+        tag_links = TagLink.objects.bulk_create([
+            TagLink(recipe_id=recipe.id, tag_id=tags[name].id)
+            for recipe, item in zip(recipes, validated_data)
+            for name in dict.fromkeys(t['name'] for t in item.get('tags', []))
+        ])
+        ingredient_links = IngredientLink.objects.bulk_create([
+            IngredientLink(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[name].id,
+            )
+            for recipe, item in zip(recipes, validated_data)
+            for name in dict.fromkeys(
+                i['name'] for i in item.get('ingredients', []))
+        ])
+        Tag.objects.change_recipe_count(
+            Counter(link.tag_id for link in tag_links))
+        Ingredient.objects.change_recipe_count(
+            Counter(link.ingredient_id for link in ingredient_links))
+
+        # bulk_create does not send post_save either, so the search
+        # vectors are computed here.
+        Recipe.objects.filter(
+            pk__in=[recipe.id for recipe in recipes]
+        ).update_search_vector()
+        for user_id in {recipe.user_id for recipe in recipes}:
+            bump_data_version(user_id)
+
+        return recipes
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     # We are using the ModelSerializer because this serializer
     # is going to represent a specific model in the system,
@@ -50,47 +120,61 @@ class RecipeSerializer(serializers.ModelSerializer):
         # We don't want the user to change the database id of a recipe.
         # We only want them to be able to change the fields listed above.
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handle getting or creating tags as needed."""
+    def _get_or_create_attrs(self, model, items):
+        """Return the user's objects for the given names, creating the
+        missing ones with a single bulk insert."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
+        names = list(dict.fromkeys(item['name'] for item in items))
+        if not names:
+            return []
+
+        objs = model.objects.filter(user=auth_user, name__in=names)
+        existing = {obj.name for obj in objs}
+        missing = [name for name in names if name not in existing]
+        if missing:
+            # Conflicts mean another request just created the same name,
+            # in which case its row is picked up by the query below.
+            model.objects.bulk_create(
+                [model(user=auth_user, name=name) for name in missing],
+                ignore_conflicts=True,
             )
-            recipe.tags.add(tag_obj)
+            objs = objs.all()
+
+        return list(objs)
+
+    def _get_or_create_tags(self, tags):
+        """Handle getting or creating tags as needed."""
+        return self._get_or_create_attrs(Tag, tags)
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
+    def _get_or_create_ingredients(self, ingredients):
         """Handle getting or creating ingredients as needed."""
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        return self._get_or_create_attrs(Ingredient, ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        recipe.tags.add(*self._get_or_create_tags(tags))
+        recipe.ingredients.add(
+            *self._get_or_create_ingredients(ingredients))
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe."""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
+        # set() only writes the difference between the old and new links.
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_tags(tags))
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_ingredients(ingredients))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -99,18 +183,176 @@ class RecipeSerializer(serializers.ModelSerializer):
         return instance
 
 
+def media_url(name, request=None):
+    """Return the URL of a stored file, absolute if given the request."""
+    url = content_hashed_storage.url(name)
+    if request is not None:
+        url = request.build_absolute_uri(url)
+    return url
+
+
+def rendition_urls(renditions, request=None):
+    """Turn rendition storage names into URLs."""
+    return {
+        size: {fmt: media_url(name, request) for fmt, name in formats.items()}
+        for size, formats in renditions.items()
+    }
+
+
+@extend_schema_field({
+    'type': 'object',
+    'description': 'URLs of the processed image, by size and format.',
+    'properties': {
+        size: {
+            'type': 'object',
+            'properties': {
+                fmt: {'type': 'string', 'format': 'uri'}
+                for fmt in RENDITION_FORMATS
+            },
+        }
+        for size in RENDITION_SIZES
+    },
+    'readOnly': True,
+})
+class RenditionURLsField(serializers.Field):
+    """Read-only field turning rendition storage names into URLs."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, renditions):
+        return rendition_urls(renditions, self.context.get('request'))
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for the recipe details"""
+    image_renditions = RenditionURLsField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_status', 'image_renditions',
+        ]
+        read_only_fields = ['id', 'image_status']
+
+
+def related_rows(model, recipe_ids):
+    """Return the ids and names of the tags or ingredients of recipes, by
+    recipe, in the order prefetching them would."""
+    related = defaultdict(list)
+    rows = model.objects.filter(recipe__in=recipe_ids)\
+        .values_list('recipe', 'id', 'name')
+    for recipe_id, obj_id, name in rows:
+        related[recipe_id].append({'id': obj_id, 'name': name})
+    return related
+
+
+class _RecipeRows:
+    """Read-only fast path of RecipeSerializer, for lists and details.
+
+    Rather than model instances, it takes the rows of a values()
+    queryset returned by rows(), fetches the tags and ingredients of the
+    recipes as rows too, and builds the payloads as plain dicts, without
+    the per-field work of serializers. The JSON rendered is the same.
+
+    Given fields, a subset of its fields, only those are rendered: rows()
+    selects only their columns, and the tags or ingredients are only
+    fetched if rendered. Values needing more than their column are
+    formatted by the format_<field> methods."""
+    fields = RecipeSerializer.Meta.fields
+    related_models = {'tags': Tag, 'ingredients': Ingredient}
+
+    def __init__(self, instance, many=False, context=None, fields=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        if fields is not None:
+            self.fields = [field for field in self.fields if field in fields]
+        self._formatters = {
+            field: getattr(self, f'format_{field}')
+            for field in self.fields if hasattr(self, f'format_{field}')
+        }
+
+    @classmethod
+    def rows(cls, queryset, fields=None):
+        """Return the rows of a recipe queryset with the columns of the
+        fields, the id, and the annotations (the search rank) for the
+        pagination cursor."""
+        columns = [
+            field for field in cls.fields
+            if field not in cls.related_models
+            and (fields is None or field in fields)
+        ]
+        return queryset.values(
+            *dict.fromkeys(['id', *columns]),
+            *queryset.query.annotation_select,
+        )
+
+    @property
+    def data(self):
+        if self.many:
+            return self.to_representation(list(self.instance))
+        return self.to_representation([self.instance])[0]
+
+    def to_representation(self, rows):
+        if not rows:
+            return []
+        recipe_ids = [row['id'] for row in rows]
+        related = {
+            field: related_rows(model, recipe_ids)
+            for field, model in self.related_models.items()
+            if field in self.fields
+        }
+        return [self.represent(row, related) for row in rows]
+
+    def represent(self, row, related):
+        """Return the payload of a recipe row."""
+        data = {}
+        for field in self.fields:
+            if field in related:
+                data[field] = related[field].get(row['id'], [])
+            elif field in self._formatters:
+                data[field] = self._formatters[field](row[field])
+            else:
+                data[field] = row[field]
+        return data
+
+    def format_price(self, price):
+        # As DecimalField renders it, the column having 2 decimals.
+        return f'{price:f}'
+
+
+class RecipeRowSerializer(TimedSerializerMixin, _RecipeRows):
+    """Fast path of RecipeSerializer, see _RecipeRows."""
+
+
+class RecipeDetailRowSerializer(RecipeRowSerializer):
+    """Fast path of RecipeDetailSerializer, see _RecipeRows."""
+    fields = RecipeDetailSerializer.Meta.fields
+
+    def format_image(self, name):
+        return media_url(name, self.context.get('request')) if name else None
+
+    def format_image_renditions(self, renditions):
+        return rendition_urls(renditions, self.context.get('request'))
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
-    """Serializer for uploading images to recipes."""
+    """Serializer for uploading images to recipes.
+
+    The upload is stored as is and queued for processing; image_status
+    tells when the renditions are ready."""
+    image_renditions = RenditionURLsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
+        fields = ['id', 'image', 'image_status', 'image_renditions']
+        read_only_fields = ['id', 'image_status']
         extra_kwargs = {'image': {'required': 'True'}}
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Store the uploaded image and queue it for processing."""
+        recipe = super().update(instance, validated_data)
+        enqueue_image(recipe)
+        return recipe
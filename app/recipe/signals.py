@@ -0,0 +1,160 @@
+"""
+Signal handlers for the recipe API.
+"""
+from collections import Counter
+
+from django.db.models.signals import (
+    post_save,
+    pre_delete,
+    post_delete,
+    m2m_changed,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_data_version
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_change(sender, instance, **kwargs):
+    """Invalidate the owner's cached responses when an object changes."""
+    bump_data_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_link_change(sender, instance, action, **kwargs):
+    """Invalidate the owner's cached responses when links change."""
+    if action.startswith('post_'):
+        bump_data_version(instance.user_id)
+
+
+def _linked_recipes(instance, action, reverse, pk_set):
+    """Return the recipes whose links a m2m_changed signal is about, or
+    None if there is nothing to do for this action."""
+    if reverse:
+        # The instance is a tag or ingredient, and pk_set holds recipes.
+        if action == 'pre_clear':
+            return Recipe.objects.filter(
+                pk__in=list(instance.recipe_set.values_list('pk', flat=True)))
+        if action in ('post_add', 'post_remove'):
+            return Recipe.objects.filter(pk__in=pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        return Recipe.objects.filter(pk=instance.pk)
+    return None
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes_on_link_change(sender, instance, action, reverse,
+                                 pk_set, **kwargs):
+    """Mark recipes as modified when their tags or ingredients change,
+    so their ETag and Last-Modified change too."""
+    recipes = _linked_recipes(instance, action, reverse, pk_set)
+    if recipes is not None:
+        recipes.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_on_delete(sender, instance, **kwargs):
+    """Mark the recipes of a deleted tag or ingredient as modified, as
+    their links are deleted without m2m_changed signals."""
+    instance.recipe_set.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector(sender, instance, **kwargs):
+    """Index the title and description of a saved recipe."""
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_search_vector_on_link_change(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    """Index the ingredient names of recipes whose ingredients change."""
+    if reverse and action == 'pre_clear':
+        # Reindex once the links are gone.
+        instance._recipes_to_reindex = _linked_recipes(
+            instance, action, reverse, pk_set)
+        return
+    if reverse and action == 'post_clear':
+        recipes = instance._recipes_to_reindex
+    else:
+        recipes = _linked_recipes(instance, action, reverse, pk_set)
+    if recipes is not None:
+        recipes.update_search_vector()
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_to_reindex(sender, instance, **kwargs):
+    """Remember the recipes of an ingredient about to be deleted."""
+    instance._recipes_to_reindex = Recipe.objects.filter(
+        pk__in=list(instance.recipe_set.values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=Ingredient)
+def update_search_vector_on_delete(sender, instance, **kwargs):
+    """Reindex the recipes of a deleted ingredient."""
+    instance._recipes_to_reindex.update_search_vector()
+
+
+@receiver(post_save, sender=Ingredient)
+def update_search_vector_on_rename(sender, instance, created, **kwargs):
+    """Reindex the recipes of a renamed ingredient."""
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update_search_vector()
+
+
+# Model and through table column of the items counted by each link table.
+COUNTED_LINKS = {
+    Recipe.tags.through: (Tag, 'tag_id'),
+    Recipe.ingredients.through: (Ingredient, 'ingredient_id'),
+}
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_recipes_on_link_change(sender, instance, action, reverse,
+                                 pk_set, **kwargs):
+    """Keep the recipe count of tags and ingredients in step with their
+    links, in the transaction changing them."""
+    model, column = COUNTED_LINKS[sender]
+    if action == 'post_add':
+        # pk_set only holds the links actually added.
+        if reverse:
+            deltas = {instance.pk: len(pk_set)}
+        else:
+            deltas = dict.fromkeys(pk_set, 1)
+        model.objects.change_recipe_count(deltas)
+    elif action in ('pre_remove', 'pre_clear'):
+        # pk_set may hold items that are not linked, so count the links
+        # that are about to go.
+        links = sender.objects.filter(
+            **{column if reverse else 'recipe_id': instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(
+                **{'recipe_id__in' if reverse else f'{column}__in': pk_set})
+        removed = Counter(links.values_list(column, flat=True))
+        instance.__dict__.setdefault('_removed_links', {})[sender] = removed
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__['_removed_links'].pop(sender)
+        model.objects.change_recipe_count(
+            {pk: -count for pk, count in removed.items()})
+
+
+@receiver(pre_delete, sender=Recipe)
+def count_recipes_on_delete(sender, instance, **kwargs):
+    """Uncount a deleted recipe from its tags and ingredients, whose links
+    are deleted without m2m_changed signals."""
+    for through, (model, column) in COUNTED_LINKS.items():
+        model.objects.change_recipe_count({
+            pk: -1 for pk in through.objects.filter(recipe_id=instance.pk)
+            .values_list(column, flat=True)
+        })
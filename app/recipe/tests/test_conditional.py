@@ -0,0 +1,165 @@
+"""
+Tests for conditional GET requests on the recipe API.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import DataVersion, Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_list_not_modified(self):
+        """Test a matching ETag returns 304 with a single query."""
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_depends_on_query(self):
+        """Test the list ETag differs per query string."""
+        res = self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, {'tags': '1'},
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_changes_on_tag_rename(self):
+        """Test renaming a tag changes the list ETag."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def _age_data(self):
+        """Date the data an hour back, so that changes made now are
+        modified since, at the one second resolution of HTTP dates."""
+        past = timezone.now() - timedelta(hours=1)
+        DataVersion.objects.update(modified_at=past)
+        for model in [Recipe, Tag]:
+            model.objects.update(updated_at=past)
+
+    def test_list_not_modified_since(self):
+        """Test an unchanged list is not modified since its
+        Last-Modified."""
+        self._age_data()
+        res = self.client.get(RECIPES_URL)
+
+        res = self.client.get(
+            RECIPES_URL, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified_by_deletes(self):
+        """Test deleting a recipe or a tag advances the list's
+        Last-Modified."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        create_recipe(user=self.user)
+
+        for delete in [tag.delete, self.recipe.delete]:
+            self._age_data()
+            res = self.client.get(RECIPES_URL)
+
+            delete()
+            res = self.client.get(
+                RECIPES_URL, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_modified_by_tag_delete(self):
+        """Test deleting a tag of a recipe advances its Last-Modified."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        self._age_data()
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+
+        tag.delete()
+        res = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'], [])
+
+    def test_detail_not_modified(self):
+        """Test a matching ETag on the detail returns 304."""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_detail_etag_changes_on_tag_swap(self):
+        """Test replacing a recipe's tag changes its ETag."""
+        old_tag = Tag.objects.create(user=self.user, name='Old')
+        new_tag = Tag.objects.create(user=self.user, name='New')
+        self.recipe.tags.add(old_tag)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.recipe.tags.set([new_tag])
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'New')
+
+    def test_detail_of_other_user_not_found(self):
+        """Test the detail of another user's recipe is still a 404."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        recipe = create_recipe(user=other_user)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,266 @@
+"""
+Tests for the background image processing.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+import shutil
+import tempfile
+import threading
+
+from PIL import Image
+import psycopg2
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core.models import ImageJob, ImageStatus, Recipe
+from core.storage import content_hashed_storage
+from recipe import images
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def jpeg_bytes(size=(3000, 1500), orientation=None):
+    """Return an encoded JPEG, optionally with an EXIF orientation."""
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x010f] = 'Camera maker'
+    if orientation:
+        exif[0x0112] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageProcessingTests(TestCase):
+    """Test processing uploaded images."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def _upload(self, content):
+        self.recipe.image.save('photo.jpg', ContentFile(content))
+        return images.enqueue_image(self.recipe)
+
+    def test_render_image_sizes_and_metadata(self):
+        """Test renditions are resized, rotated and have no EXIF data."""
+        renditions = images.render_image(BytesIO(jpeg_bytes(orientation=6)))
+
+        self.assertEqual(set(renditions), set(images.RENDITION_SIZES))
+        for size, formats in renditions.items():
+            for content in formats.values():
+                with Image.open(BytesIO(content)) as image:
+                    # Orientation 6 is a quarter turn: portrait output.
+                    self.assertEqual(
+                        max(image.size), images.RENDITION_SIZES[size])
+                    self.assertGreater(image.height, image.width)
+                    self.assertEqual(len(image.getexif()), 0)
+
+    def test_process_images_command(self):
+        """Test the worker processes queued images."""
+        job = self._upload(jpeg_bytes())
+        original = self.recipe.image.name
+
+        call_command('process_images', once=True, workers=1,
+                     stdout=StringIO())
+
+        job.refresh_from_db()
+        self.recipe.refresh_from_db()
+        self.assertEqual(job.status, ImageStatus.DONE)
+        self.assertEqual(self.recipe.image_status, ImageStatus.DONE)
+        self.assertEqual(
+            self.recipe.image.name,
+            self.recipe.image_renditions['full']['jpeg'],
+        )
+        self.assertFalse(default_storage.exists(original))
+        for formats in self.recipe.image_renditions.values():
+            for name in formats.values():
+                self.assertTrue(default_storage.exists(name))
+
+    def test_detail_exposes_rendition_urls(self):
+        """Test the recipe detail returns URLs of the renditions."""
+        self._upload(jpeg_bytes())
+        images.process_job(images.claim_next_job())
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        res = client.get(url)
+
+        self.assertEqual(res.data['image_status'], ImageStatus.DONE)
+        self.assertTrue(
+            res.data['image_renditions']['thumb']['webp']
+            .startswith('http://testserver/static/media/uploads/recipe/'))
+
+    def test_schema_documents_renditions(self):
+        """Test the API schema describes the rendition URLs."""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+
+        renditions = res.json()['components']['schemas']['RecipeDetail'][
+            'properties']['image_renditions']
+        self.assertEqual(renditions['type'], 'object')
+        self.assertEqual(
+            renditions['properties']['thumb']['properties']['webp'],
+            {'type': 'string', 'format': 'uri'})
+
+    def test_identical_images_are_stored_once(self):
+        """Test identical uploads share content-hashed renditions."""
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        content = jpeg_bytes()
+        self._upload(content)
+        other.image.save('other.jpg', ContentFile(content))
+        images.enqueue_image(other)
+
+        call_command('process_images', once=True, workers=1,
+                     stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, other.image_renditions)
+        name = self.recipe.image_renditions['thumb']['webp']
+        self.assertRegex(name, r'renditions/[0-9a-f]{2}/[0-9a-f]{64}\.webp$')
+
+        # Replacing one recipe's image keeps the files the other uses.
+        self._upload(jpeg_bytes(size=(100, 100)))
+        call_command('process_images', once=True, workers=1,
+                     stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(other.image.name))
+
+    def test_superseded_job_is_discarded(self):
+        """Test a job for a replaced upload does not overwrite it."""
+        job = self._upload(jpeg_bytes())
+        self._upload(jpeg_bytes(size=(100, 100)))
+        newest = self.recipe.image.name
+
+        claimed = images.claim_next_job()
+        self.assertEqual(claimed, job)
+        images.process_job(claimed)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, newest)
+        self.assertEqual(self.recipe.image_status, ImageStatus.PENDING)
+
+    def test_failing_job_is_retried_then_failed(self):
+        """Test an image that cannot be decoded ends up failed."""
+        job = self._upload(b'not an image')
+
+        for _ in range(images.MAX_ATTEMPTS):
+            claimed = images.claim_next_job()
+            self.assertEqual(claimed, job)
+            self.assertFalse(images.process_job(claimed))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageStatus.FAILED)
+        self.assertIsNone(images.claim_next_job())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+        self.assertEqual(ImageJob.objects.count(), 1)
+
+    def test_stale_job_is_claimed_again(self):
+        """Test a job left processing by a stopped worker is reclaimed
+        once its lease expired."""
+        job = self._upload(jpeg_bytes())
+        self.assertEqual(images.claim_next_job(), job)
+        self.assertIsNone(images.claim_next_job())
+
+        ImageJob.objects.filter(pk=job.pk).update(
+            claimed_at=timezone.now() - images.JOB_LEASE
+            - timedelta(seconds=1))
+        claimed = images.claim_next_job()
+
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertTrue(images.process_job(claimed))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.DONE)
+
+    def test_stale_job_out_of_attempts_is_failed(self):
+        """Test a job whose workers kept stopping ends up failed."""
+        job = self._upload(jpeg_bytes())
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageStatus.PROCESSING,
+            attempts=images.MAX_ATTEMPTS,
+            claimed_at=timezone.now() - images.JOB_LEASE
+            - timedelta(seconds=1),
+        )
+
+        self.assertIsNone(images.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageStatus.FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class StoredFileLockTests(TransactionTestCase):
+    """Test deleting files does not race saving the same content."""
+
+    def test_file_saved_again_is_not_deleted(self):
+        """Test a file is only checked for references once a transaction
+        saving it again committed."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        name = content_hashed_storage.save(
+            'uploads/recipe/photo.jpg', ContentFile(jpeg_bytes()))
+
+        # Another process saving the same content for a recipe, as
+        # ContentHashedStorage.save does, not committed yet.
+        other = psycopg2.connect(**connection.get_connection_params())
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(hashtext(%s))', [name])
+            cursor.execute(
+                'UPDATE core_recipe SET image = %s WHERE id = %s',
+                [name, recipe.id])
+
+        deleting = threading.Thread(
+            target=lambda: (images.delete_unused_files([name]),
+                            connection.close()))
+        deleting.start()
+        deleting.join(0.5)
+        self.assertTrue(deleting.is_alive())
+        other.commit()
+        deleting.join()
+
+        self.assertTrue(content_hashed_storage.exists(name))
@@ -131,3 +131,44 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def _names(self, res):
+        return [ingredient['name'] for ingredient in res.data]
+
+    def test_autocomplete_prefix(self):
+        """Test autocompleting a prefix, most used first."""
+        tomato = Ingredient.objects.create(user=self.user, name='Tomato')
+        Ingredient.objects.create(user=self.user, name='Tomatillo')
+        Ingredient.objects.create(user=self.user, name='Cherry tomato')
+        other_user = create_user(email='other@example.com')
+        Ingredient.objects.create(user=other_user, name='Tomato paste')
+        recipe = Recipe.objects.create(
+            title='Salsa',
+            time_minutes=10,
+            price=Decimal('3.00'),
+            user=self.user,
+        )
+        recipe.ingredients.add(tomato)
+
+        res = self.client.get(INGREDIENTS_URL, {'prefix': 'toma'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._names(res), ['Tomato', 'Tomatillo'])
+
+    def test_autocomplete_fuzzy(self):
+        """Test autocompleting finds misspelt and contained names,
+        most similar first, up to the limit."""
+        for name in ['Parmesan', 'Parmesan cheese', 'Pesto', 'Basil']:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'parmesen'})
+        self.assertEqual(self._names(res), ['Parmesan', 'Parmesan cheese'])
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'mesan', 'limit': 1})
+        self.assertEqual(self._names(res), ['Parmesan'])
+
+    def test_autocomplete_invalid_limit(self):
+        """Test an out of range autocomplete limit returns bad request."""
+        res = self.client.get(INGREDIENTS_URL, {'q': 'egg', 'limit': 500})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,87 @@
+"""
+Tests for the streaming parsers.
+"""
+from io import BytesIO
+
+from django.test import SimpleTestCase, override_settings
+
+from rest_framework.exceptions import ParseError
+
+from recipe.parsers import JSONArrayStreamParser, NDJSONParser
+
+
+class JSONArrayStreamParserTests(SimpleTestCase):
+    """Test parsing JSON arrays one element at a time."""
+
+    def setUp(self) -> None:
+        self.parser = JSONArrayStreamParser()
+        # Tiny reads split items, numbers and multi-byte characters.
+        self.parser.chunk_size = 3
+
+    def parse(self, body):
+        return list(self.parser.parse(BytesIO(body.encode())))
+
+    def test_parse_items_across_reads(self):
+        """Test items split between reads are decoded whole."""
+        items = self.parse(' [{"title": "Crème brûlée"}, 123456, [1, 2]] ')
+
+        self.assertEqual(items, [{'title': 'Crème brûlée'}, 123456, [1, 2]])
+
+    def test_parse_empty_array(self):
+        """Test an empty array yields nothing."""
+        self.assertEqual(self.parse('[ ]'), [])
+
+    def test_parse_not_an_array(self):
+        """Test a body that is not an array yields a parse error."""
+        items = self.parse('{"title": "Soup"}')
+
+        self.assertEqual(len(items), 1)
+        self.assertIsInstance(items[0], ParseError)
+
+    def test_parse_invalid_item_stops(self):
+        """Test items before invalid JSON are kept and parsing stops."""
+        items = self.parse('[{"title": "Soup"}, {bad}, {"title": "Stew"}]')
+
+        self.assertEqual(items[0], {'title': 'Soup'})
+        self.assertEqual(len(items), 2)
+        self.assertIsInstance(items[1], ParseError)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=20)
+    def test_parse_item_too_large_stops(self):
+        """Test an item that does not end is not read to the end of the
+        body."""
+        stream = BytesIO(('[{"title": "Soup"}, {bad' + ' ' * 1000).encode())
+
+        items = list(self.parser.parse(stream))
+
+        self.assertEqual(items[0], {'title': 'Soup'})
+        self.assertEqual(len(items), 2)
+        self.assertIsInstance(items[1], ParseError)
+        self.assertLess(stream.tell(), 100)
+
+
+class NDJSONParserTests(SimpleTestCase):
+    """Test parsing newline delimited JSON."""
+
+    def test_parse_lines(self):
+        """Test each line is an item and bad lines yield errors."""
+        body = b'{"title": "Soup"}\n\nnot json\n{"title": "Stew"}\n'
+
+        items = list(NDJSONParser().parse(BytesIO(body)))
+
+        self.assertEqual(items[0], {'title': 'Soup'})
+        self.assertIsInstance(items[1], ParseError)
+        self.assertEqual(items[2], {'title': 'Stew'})
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=20)
+    def test_parse_line_too_long_stops(self):
+        """Test a line over the size limit is not read whole."""
+        stream = BytesIO(
+            b'{"title": "Soup"}\n{"title": "' + b'x' * 1000 + b'"}\n')
+
+        items = list(NDJSONParser().parse(stream))
+
+        self.assertEqual(items[0], {'title': 'Soup'})
+        self.assertEqual(len(items), 2)
+        self.assertIsInstance(items[1], ParseError)
+        self.assertLess(stream.tell(), 100)
@@ -0,0 +1,338 @@
+"""
+Test the queries of the recipe APIs against the query baseline.
+"""
+from decimal import Decimal
+from io import BytesIO
+import shutil
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.testing import QueryBaselineMixin
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def tag_url(tag_id):
+    """Create and return a tag detail URL."""
+    return reverse('recipe:tag-detail', args=[tag_id])
+
+
+def ingredient_url(ingredient_id):
+    """Create and return an ingredient detail URL."""
+    return reverse('recipe:ingredient-detail', args=[ingredient_id])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeQueryCountTests(QueryBaselineMixin, TestCase):
+    """Test the queries of the recipe endpoints."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Kale')
+        self.recipe = self.add_recipes(1)[0]
+
+    def add_recipes(self, count):
+        """Create recipes, each with its own and the shared tags and
+        ingredients."""
+        recipes = []
+        for _ in range(count):
+            number = Recipe.objects.count()
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Kale soup {number}',
+                time_minutes=10, price=Decimal('5.00'))
+            recipe.tags.add(
+                self.tag,
+                Tag.objects.create(user=self.user, name=f'Tag {number}'))
+            recipe.ingredients.add(
+                self.ingredient,
+                Ingredient.objects.create(
+                    user=self.user, name=f'Ingredient {number}'))
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_recipes(self):
+        """Test listing recipes does not query per recipe."""
+        res = self.assertQueriesMatchBaseline(
+            'recipe-list', lambda: self.client.get(RECIPES_URL),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_recipes_paginated(self):
+        """Test a page of recipes does not query per recipe."""
+        res = self.assertQueriesMatchBaseline(
+            'recipe-list-paginated',
+            lambda: self.client.get(RECIPES_URL, {'page_size': 2}),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_filter_recipes(self):
+        """Test filtering recipes does not query per recipe."""
+        params = {'tags': self.tag.id, 'ingredients': self.ingredient.id}
+
+        res = self.assertQueriesMatchBaseline(
+            'recipe-list-filter',
+            lambda: self.client.get(RECIPES_URL, params),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_search_recipes(self):
+        """Test searching recipes does not query per recipe."""
+        res = self.assertQueriesMatchBaseline(
+            'recipe-list-search',
+            lambda: self.client.get(RECIPES_URL, {'search': 'kale'}),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_recipes_fields(self):
+        """Test listing selected fields does not query per recipe."""
+        res = self.assertQueriesMatchBaseline(
+            'recipe-list-fields',
+            lambda: self.client.get(RECIPES_URL, {'fields': 'id,title'}),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_recipe(self):
+        """Test the queries of a recipe detail."""
+        res = self.assertQueriesMatchBaseline(
+            'recipe-detail',
+            lambda: self.client.get(detail_url(self.recipe.id)),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_recipe(self):
+        """Test the queries of creating a recipe."""
+        payload = {
+            'title': 'Stew',
+            'time_minutes': 60,
+            'price': '9.00',
+            'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}],
+            'ingredients': [{'name': 'Kale'}, {'name': 'Beans'}],
+        }
+
+        res = self.assertQueriesMatchBaseline(
+            'recipe-create',
+            lambda: self.client.post(RECIPES_URL, payload, format='json'))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_update_recipe(self):
+        """Test the queries of updating a recipe."""
+        payload = {'title': 'Kale stew', 'tags': [{'name': 'Dinner'}]}
+
+        res = self.assertQueriesMatchBaseline(
+            'recipe-partial-update',
+            lambda: self.client.patch(
+                detail_url(self.recipe.id), payload, format='json'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_replace_recipe(self):
+        """Test the queries of replacing a recipe."""
+        payload = {
+            'title': 'Kale stew',
+            'time_minutes': 30,
+            'price': '4.00',
+            'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}],
+            'ingredients': [{'name': 'Kale'}],
+        }
+
+        res = self.assertQueriesMatchBaseline(
+            'recipe-update',
+            lambda: self.client.put(
+                detail_url(self.recipe.id), payload, format='json'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bulk_import(self):
+        """Test importing recipes does not query per recipe."""
+        rows = []
+
+        def add_rows(count):
+            for _ in range(count):
+                rows.append({
+                    'title': f'Stew {len(rows)}',
+                    'time_minutes': 60,
+                    'price': '9.00',
+                    'tags': [{'name': 'Vegan'}, {'name': f'Tag {len(rows)}'}],
+                    'ingredients': [{'name': 'Kale'}],
+                })
+
+        res = self.assertQueriesMatchBaseline(
+            'recipe-bulk',
+            lambda: self.client.post(BULK_URL, rows, format='json'),
+            add_rows=add_rows)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['errors'], [])
+
+    def test_export(self):
+        """Test exporting recipes does not query per recipe."""
+        def export():
+            res = self.client.get(EXPORT_URL)
+            # The queries run while the content is streamed.
+            res.exported = b''.join(res.streaming_content)
+            return res
+
+        res = self.assertQueriesMatchBaseline(
+            'recipe-export', export, add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.exported.splitlines()), 4)
+
+    def test_upload_image(self):
+        """Test the queries of uploading an image."""
+        image = BytesIO()
+        Image.new('RGB', (10, 10)).save(image, 'JPEG')
+
+        def upload():
+            image.seek(0)
+            image.name = 'photo.jpg'
+            return self.client.post(
+                upload_url(self.recipe.id), {'image': image},
+                format='multipart')
+
+        res = self.assertQueriesMatchBaseline('recipe-upload-image', upload)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_delete_recipe(self):
+        """Test the queries of deleting a recipe."""
+        res = self.assertQueriesMatchBaseline(
+            'recipe-delete',
+            lambda: self.client.delete(detail_url(self.recipe.id)))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_list_tags(self):
+        """Test listing tags does not query per tag."""
+        res = self.assertQueriesMatchBaseline(
+            'tag-list', lambda: self.client.get(TAGS_URL),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_assigned_tags(self):
+        """Test listing assigned tags does not query per tag."""
+        res = self.assertQueriesMatchBaseline(
+            'tag-list-assigned',
+            lambda: self.client.get(TAGS_URL, {'assigned_only': 1}),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_ingredients(self):
+        """Test listing ingredients does not query per ingredient."""
+        res = self.assertQueriesMatchBaseline(
+            'ingredient-list', lambda: self.client.get(INGREDIENTS_URL),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_autocomplete_tags(self):
+        """Test autocompleting tags does not query per tag."""
+        res = self.assertQueriesMatchBaseline(
+            'tag-list-autocomplete',
+            lambda: self.client.get(TAGS_URL, {'q': 'tag'}),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_autocomplete_ingredients_prefix(self):
+        """Test autocompleting ingredient prefixes does not query per
+        ingredient."""
+        res = self.assertQueriesMatchBaseline(
+            'ingredient-list-autocomplete',
+            lambda: self.client.get(INGREDIENTS_URL, {'prefix': 'ing'}),
+            add_rows=self.add_recipes)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_delete_tags(self):
+        """Test the queries of updating and deleting a tag."""
+        tag_id = self.tag.id
+
+        for name, make_request, status_code in [
+            ('tag-update', lambda: self.client.put(
+                tag_url(tag_id), {'name': 'Vegetarian'}), status.HTTP_200_OK),
+            ('tag-partial-update', lambda: self.client.patch(
+                tag_url(tag_id), {'name': 'Vegan'}), status.HTTP_200_OK),
+            ('tag-delete', lambda: self.client.delete(tag_url(tag_id)),
+             status.HTTP_204_NO_CONTENT),
+        ]:
+            with self.subTest(name):
+                res = self.assertQueriesMatchBaseline(name, make_request)
+
+                self.assertEqual(res.status_code, status_code)
+
+    def test_update_delete_ingredients(self):
+        """Test the queries of updating and deleting an ingredient."""
+        url = ingredient_url(self.ingredient.id)
+
+        for name, make_request, status_code in [
+            ('ingredient-update', lambda: self.client.put(
+                url, {'name': 'Spinach'}), status.HTTP_200_OK),
+            ('ingredient-partial-update', lambda: self.client.patch(
+                url, {'name': 'Kale'}), status.HTTP_200_OK),
+            ('ingredient-delete', lambda: self.client.delete(url),
+             status.HTTP_204_NO_CONTENT),
+        ]:
+            with self.subTest(name):
+                res = self.assertQueriesMatchBaseline(name, make_request)
+
+                self.assertEqual(res.status_code, status_code)
+
+    def test_stats(self):
+        """Test the queries of the staff statistics endpoints."""
+        self.user.is_staff = True
+        self.user.save()
+
+        for name, url in [
+            ('cache-stats', reverse('core:cache-stats')),
+            ('db-stats', reverse('core:db-stats')),
+            ('metrics', reverse('core:metrics')),
+        ]:
+            with self.subTest(name):
+                res = self.assertQueriesMatchBaseline(
+                    name, lambda: self.client.get(url))
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
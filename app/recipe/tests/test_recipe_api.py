@@ -2,13 +2,18 @@
 Test for recipe APIs.
 """
 from decimal import Decimal
+import csv
+import json
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -21,6 +26,8 @@ from core.models import (
 )
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.pagination import RecipeCursorPagination
+from recipe.views import RecipeViewSet
 
 RECIPES_URL = reverse('recipe:recipe-list')
 
@@ -35,6 +42,16 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def bulk_url():
+    """Return the bulk import URL."""
+    return reverse('recipe:recipe-bulk')
+
+
+def export_url():
+    """Return the export URL."""
+    return reverse('recipe:recipe-export')
+
+
 def create_recipe(user, **params):
     """Create and return a sample recipe."""
     defaults = {
@@ -451,6 +468,466 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def _count_queries(self, method, url, payload):
+        """Return the number of queries run by a request."""
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, payload, format='json')
+        self.assertIn(res.status_code,
+                      [status.HTTP_200_OK, status.HTTP_201_CREATED])
+        return len(queries)
+
+    def test_create_recipe_query_count_is_constant(self):
+        """Test creating a recipe costs the same for 2 or 20 tags."""
+        def payload(count):
+            return {
+                'title': 'Curry',
+                'time_minutes': 30,
+                'price': Decimal('2.50'),
+                'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                'ingredients': [{'name': f'Ing {i}'} for i in range(count)],
+            }
+
+        few = self._count_queries('post', RECIPES_URL, payload(2))
+        many = self._count_queries('post', RECIPES_URL, payload(20))
+
+        self.assertEqual(few, many)
+        recipe = Recipe.objects.order_by('-id').first()
+        self.assertEqual(recipe.tags.count(), 20)
+        self.assertEqual(recipe.ingredients.count(), 20)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 20)
+
+    def test_update_recipe_writes_only_tag_changes(self):
+        """Test updating tags keeps unchanged links and swaps the rest."""
+        recipe = create_recipe(user=self.user)
+        kept = Tag.objects.create(user=self.user, name='Kept')
+        removed = Tag.objects.create(user=self.user, name='Removed')
+        recipe.tags.add(kept, removed)
+        kept_link = Recipe.tags.through.objects.get(recipe=recipe, tag=kept)
+
+        payload = {'tags': [{'name': 'Kept'}, {'name': 'Added'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Kept', 'Added'},
+        )
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(id=kept_link.id).exists())
+
+    def test_create_recipe_duplicate_tag_names(self):
+        """Test repeated tag names in a payload create a single tag."""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Thai'}, {'name': 'Thai'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_filter_by_all_tags(self):
+        """Test filtering recipes having all of the given tags."""
+        r1 = create_recipe(user=self.user, title='Thai Green Curry')
+        r2 = create_recipe(user=self.user, title='Thai Red Curry')
+        tag1 = Tag.objects.create(user=self.user, name='Thai')
+        tag2 = Tag.objects.create(user=self.user, name='Green')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [RecipeSerializer(r1).data])
+
+    def test_filter_by_tags_and_ingredients_unique(self):
+        """Test filtering on several matches returns each recipe once."""
+        recipe = create_recipe(user=self.user)
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ['Thai', 'Dinner']]
+        ingredients = [Ingredient.objects.create(user=self.user, name=name)
+                       for name in ['Rice', 'Chili']]
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+
+        params = {
+            'tags': ','.join(str(tag.id) for tag in tags),
+            'ingredients': ','.join(str(i.id) for i in ingredients),
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode returns bad request."""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _create_recipes_with_relations(self, count):
+        """Create recipes that each have a tag and an ingredient."""
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {recipe.id}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user, name=f'Ing {recipe.id}'))
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes does not run a query per recipe."""
+        # ETag validators, recipes, tags and ingredients.
+        self._create_recipes_with_relations(3)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data), 3)
+
+        self._create_recipes_with_relations(6)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data), 9)
+
+    def test_detail_query_count(self):
+        """Test retrieving a recipe prefetches tags and ingredients."""
+        self._create_recipes_with_relations(1)
+        recipe = Recipe.objects.get(user=self.user)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+    def test_list_unpaginated_by_default(self):
+        """Test recipes are returned as a plain list without a page size."""
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertIsInstance(res.data, list)
+
+    def test_list_cursor_pagination(self):
+        """Test walking through recipe pages with a cursor."""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+        expected_ids = [recipe.id for recipe in reversed(recipes)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(len(ids), 2)
+
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(item['id'] for item in res.data['results'])
+
+        self.assertEqual(ids, expected_ids)
+
+    def test_list_page_size_is_bounded(self):
+        """Test the requested page size is capped by the setting."""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+
+class BulkImportTests(TestCase):
+    """Tests for the bulk recipe import API."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _row(self, title, **params):
+        row = {'title': title, 'time_minutes': 10, 'price': '3.50'}
+        row.update(params)
+        return row
+
+    def test_bulk_import_json_array(self):
+        """Test importing recipes from a JSON array."""
+        Tag.objects.create(user=self.user, name='Dinner')
+        rows = [
+            self._row('Curry', tags=[{'name': 'Dinner'}, {'name': 'Thai'}],
+                      ingredients=[{'name': 'Rice'}]),
+            self._row('Soup', tags=[{'name': 'Dinner'}]),
+        ]
+
+        with patch.object(RecipeViewSet, 'bulk_chunk_size', 1):
+            res = self.client.post(bulk_url(), rows, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'created': 2, 'errors': []})
+        curry = Recipe.objects.get(user=self.user, title='Curry')
+        self.assertEqual(
+            set(curry.tags.values_list('name', flat=True)), {'Dinner', 'Thai'})
+        self.assertEqual(curry.ingredients.get().name, 'Rice')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_import_ndjson_reports_row_errors(self):
+        """Test invalid NDJSON rows are reported and the rest imported."""
+        body = '\n'.join([
+            json.dumps(self._row('Curry')),
+            json.dumps({'title': 'No price'}),
+            'not json',
+            json.dumps(self._row('Soup')),
+        ])
+
+        res = self.client.post(
+            bulk_url(), body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual([e['row'] for e in res.data['errors']], [2, 3])
+        self.assertIn('price', res.data['errors'][0]['errors'])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_import_query_count_is_constant(self):
+        """Test a chunk is imported with a fixed number of queries."""
+        def count_queries(rows):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(bulk_url(), rows, format='json')
+            return len(queries)
+
+        few = count_queries([
+            self._row(f'Recipe {i}', tags=[{'name': f'Tag {i}'}])
+            for i in range(2)
+        ])
+        many = count_queries([
+            self._row(f'Recipe {i}', tags=[{'name': f'Tag {i}'}])
+            for i in range(2, 22)
+        ])
+
+        self.assertEqual(few, many)
+
+
+class ExportTests(TestCase):
+    """Tests for the streaming recipe export API."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}'))
+        other_user = create_user(email='other@example.com',
+                                 password='testpass123')
+        create_recipe(user=other_user)
+
+    def _content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as NDJSON, in chunks."""
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(export_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line)
+                for line in self._content(res).splitlines()]
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        expected = json.loads(json.dumps(
+            RecipeDetailSerializer(recipes, many=True).data))
+        self.assertEqual(rows, expected)
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV."""
+        res = self.client.get(export_url(), {'export_format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(self._content(res).splitlines()))
+        self.assertEqual(rows[0], RecipeDetailSerializer.Meta.fields)
+        self.assertEqual(len(rows), 6)
+        tags_column = rows[0].index('tags')
+        self.assertEqual(rows[1][tags_column], 'Tag 4')
+
+    def test_export_invalid_format(self):
+        """Test an unknown export format returns bad request."""
+        res = self.client.get(export_url(), {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SearchTests(TestCase):
+    """Tests for the recipe full text search."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _ids(self, res):
+        return [recipe['id'] for recipe in res.data]
+
+    def test_search_ranks_title_above_description(self):
+        """Test matches in the title rank above matches elsewhere."""
+        r1 = create_recipe(user=self.user, title='Pasta',
+                           description='Use fresh basil.')
+        r2 = create_recipe(user=self.user, title='Basil pesto',
+                           description='Blend it.')
+        create_recipe(user=self.user, title='Soup', description='Hot.')
+        other_user = create_user(email='other@example.com',
+                                 password='testpass123')
+        create_recipe(user=other_user, title='Basil salad')
+
+        res = self.client.get(RECIPES_URL, {'search': 'basil'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(res), [r2.id, r1.id])
+
+    def test_search_ingredient_names(self):
+        """Test searching finds recipes by ingredient name, following
+        changes to the ingredients."""
+        recipe = create_recipe(user=self.user, title='Curry')
+        ingredient = Ingredient.objects.create(user=self.user, name='Cumin')
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPES_URL, {'search': 'cumin'})
+        self.assertEqual(self._ids(res), [recipe.id])
+
+        ingredient.name = 'Turmeric'
+        ingredient.save()
+        res = self.client.get(RECIPES_URL, {'search': 'turmeric'})
+        self.assertEqual(self._ids(res), [recipe.id])
+
+        ingredient.recipe_set.clear()
+        res = self.client.get(RECIPES_URL, {'search': 'turmeric'})
+        self.assertEqual(self._ids(res), [])
+
+    def test_search_after_update(self):
+        """Test an updated recipe is found by its new title."""
+        recipe = create_recipe(user=self.user, title='Stew')
+
+        self.client.patch(detail_url(recipe.id), {'title': 'Goulash'})
+
+        res = self.client.get(RECIPES_URL, {'search': 'goulash'})
+        self.assertEqual(self._ids(res), [recipe.id])
+
+    def test_search_bulk_import(self):
+        """Test bulk imported recipes can be searched."""
+        self.client.post(bulk_url(), [{
+            'title': 'Ramen', 'time_minutes': 30, 'price': '8.00',
+            'ingredients': [{'name': 'Miso'}],
+        }], format='json')
+
+        res = self.client.get(RECIPES_URL, {'search': 'miso'})
+        self.assertEqual(len(res.data), 1)
+
+    def test_search_paginated(self):
+        """Test paging through search results keeps the ranking."""
+        recipes = [
+            create_recipe(user=self.user, title='Bread ' * (i % 3 + 1),
+                          description=f'Loaf {i}')
+            for i in range(6)
+        ]
+        expected = self._ids(self.client.get(RECIPES_URL, {
+            'search': 'bread'}))
+
+        ids = []
+        params = {'search': 'bread', 'page_size': 2}
+        res = self.client.get(RECIPES_URL, params)
+        while True:
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(expected), len(recipes))
+        self.assertEqual(ids, expected)
+
+
+class RecipeCountTests(TestCase):
+    """Tests for the recipe counts of tags and ingredients."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _counts(self, model):
+        return dict(model.objects.values_list('name', 'recipe_count'))
+
+    def test_counts_follow_recipe_changes(self):
+        """Test creating, updating and deleting recipes updates counts."""
+        payload = {
+            'title': 'Curry', 'time_minutes': 30, 'price': '8.00',
+            'tags': [{'name': 'Dinner'}, {'name': 'Spicy'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(self._counts(Tag), {'Dinner': 2, 'Spicy': 2})
+
+        self.client.patch(detail_url(res.data['id']), {
+            'tags': [{'name': 'Dinner'}, {'name': 'Lunch'}],
+        }, format='json')
+        self.assertEqual(
+            self._counts(Tag), {'Dinner': 2, 'Spicy': 1, 'Lunch': 1})
+
+        self.client.delete(detail_url(res.data['id']))
+        self.assertEqual(
+            self._counts(Tag), {'Dinner': 1, 'Spicy': 1, 'Lunch': 0})
+        self.assertEqual(self._counts(Ingredient), {'Rice': 1})
+
+    def test_counts_follow_link_changes(self):
+        """Test adding, removing and clearing links from either side
+        updates counts."""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        other = Tag.objects.create(user=self.user, name='Lunch')
+
+        tag.recipe_set.add(r1, r2)
+        r1.tags.add(other)
+        r1.tags.remove(tag, tag)
+        self.assertEqual(self._counts(Tag), {'Dinner': 1, 'Lunch': 1})
+
+        r2.tags.remove(other)
+        self.assertEqual(self._counts(Tag), {'Dinner': 1, 'Lunch': 1})
+
+        r1.tags.clear()
+        tag.recipe_set.clear()
+        self.assertEqual(self._counts(Tag), {'Dinner': 0, 'Lunch': 0})
+
+    def test_rename_keeps_count(self):
+        """Test renaming an item does not write back the count it was
+        loaded with."""
+        for model in [Tag, Ingredient]:
+            with self.subTest(model=model.__name__):
+                item = model.objects.create(user=self.user, name='Old')
+                model.objects.change_recipe_count({item.id: 2})
+
+                item.name = 'New'
+                item.save()
+                res = self.client.patch(
+                    reverse(f'recipe:{model._meta.model_name}-detail',
+                            args=[item.id]),
+                    {'name': 'Newer'},
+                )
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(self._counts(model), {'Newer': 2})
+
+    def test_counts_bulk_import(self):
+        """Test bulk imported recipes are counted."""
+        self.client.post(bulk_url(), [{
+            'title': f'Recipe {i}', 'time_minutes': 10, 'price': '3.50',
+            'tags': [{'name': 'Quick'}],
+        } for i in range(3)], format='json')
+
+        self.assertEqual(self._counts(Tag), {'Quick': 3})
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -478,8 +955,9 @@ class ImageUploadTests(TestCase):
             res = self.client.post(url, payload, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
     def test_upload_image_bad_request(self):
@@ -0,0 +1,91 @@
+"""
+Test the fast path recipe serializers render like the serializers.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    RecipeRowSerializer,
+    RecipeDetailRowSerializer,
+)
+
+
+class RowSerializerTests(TestCase):
+    """Test the row serializers produce the same JSON."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.context = {'request': APIRequestFactory().get('/')}
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        kale = Ingredient.objects.create(user=self.user, name='Kale')
+        soup = Recipe.objects.create(
+            user=self.user, title='Kale soup', time_minutes=5,
+            price=Decimal('2.50'), link='https://example.com/soup',
+            description='Hot.',
+            image='uploads/recipe/soup.jpg', image_status='ready',
+            image_renditions={'thumb': {
+                'webp': 'uploads/recipe/soup-thumb.webp',
+                'jpeg': 'uploads/recipe/soup-thumb.jpg',
+            }},
+        )
+        soup.tags.add(vegan, Tag.objects.create(user=self.user, name='Hot'))
+        soup.ingredients.add(kale)
+        stew = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=90,
+            price=Decimal('10'))
+        stew.tags.add(vegan)
+        # Without tags, ingredients nor image.
+        Recipe.objects.create(
+            user=self.user, title='Toast', time_minutes=2,
+            price=Decimal('0.99'))
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_list_same_json(self):
+        """Test a list renders the same as with RecipeSerializer."""
+        recipes = Recipe.objects.order_by('-id')
+        expected = RecipeSerializer(
+            recipes.with_tags_and_ingredients(), many=True,
+            context=self.context).data
+
+        rows = RecipeRowSerializer.rows(recipes)
+        data = RecipeRowSerializer(
+            rows, many=True, context=self.context).data
+
+        self.assertEqual(self.render(data), self.render(expected))
+
+    def test_detail_same_json(self):
+        """Test details render the same as with RecipeDetailSerializer."""
+        rows = RecipeDetailRowSerializer.rows(Recipe.objects.all())
+        for recipe in Recipe.objects.with_tags_and_ingredients():
+            expected = RecipeDetailSerializer(
+                recipe, context=self.context).data
+
+            data = RecipeDetailRowSerializer(
+                rows.get(pk=recipe.id), context=self.context).data
+
+            self.assertEqual(self.render(data), self.render(expected))
+
+    def test_search_rows_annotated(self):
+        """Test rows keep the search rank the pagination orders by."""
+        rows = RecipeRowSerializer.rows(Recipe.objects.search('kale'))
+
+        self.assertEqual([row['title'] for row in rows], ['Kale soup'])
+        self.assertIn('rank', rows[0])
+
+    def test_empty(self):
+        """Test an empty list makes no queries."""
+        rows = RecipeRowSerializer.rows(Recipe.objects.none())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(RecipeRowSerializer(rows, many=True).data, [])
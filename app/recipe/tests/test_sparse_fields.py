@@ -0,0 +1,137 @@
+"""
+Tests for the fields and omit parameters of the recipe API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SparseFieldsTests(TestCase):
+    """Test selecting the fields of recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Kale soup', time_minutes=5,
+            price=Decimal('2.50'), description='Hot.')
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Kale'))
+
+    def get(self, url, params=None):
+        """Return the response and the SQL of its queries."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        return res, [query['sql'] for query in queries]
+
+    def test_list_fields(self):
+        """Test only the requested fields are returned and read."""
+        full, full_queries = self.get(RECIPES_URL)
+
+        res, queries = self.get(RECIPES_URL, {'fields': 'title,id'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [
+            {'id': self.recipe.id, 'title': 'Kale soup'}])
+        self.assertLess(len(res.content), len(full.content))
+        # The tags and ingredients are not fetched.
+        self.assertEqual(len(queries), len(full_queries) - 2)
+        self.assertNotIn('"core_recipe"."price"', queries[-1])
+        self.assertNotIn('core_recipe_tags', ''.join(queries))
+
+    def test_list_omit(self):
+        """Test omitted fields are not returned nor read."""
+        res, queries = self.get(RECIPES_URL, {'omit': 'ingredients,link'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.json()[0]), [
+            'id', 'title', 'time_minutes', 'price', 'tags'])
+        self.assertIn('core_recipe_tags', ''.join(queries))
+        self.assertNotIn('core_recipe_ingredients', ''.join(queries))
+
+    def test_fields_and_omit(self):
+        """Test omit applies to the requested fields."""
+        res = self.client.get(
+            RECIPES_URL, {'fields': 'id,title,tags', 'omit': 'id'})
+
+        self.assertEqual(res.json(), [
+            {'title': 'Kale soup', 'tags': [
+                {'id': self.recipe.tags.get().id, 'name': 'Vegan'}]}])
+
+    def test_paginated_without_id(self):
+        """Test pages are linked when the id is not requested."""
+        Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=60,
+            price=Decimal('9.00'))
+
+        res = self.client.get(RECIPES_URL, {'fields': 'title', 'page_size': 1})
+        next_page = self.client.get(res.json()['next'])
+
+        self.assertEqual(res.json()['results'], [{'title': 'Stew'}])
+        self.assertEqual(next_page.json()['results'], [{'title': 'Kale soup'}])
+
+    def test_search_fields(self):
+        """Test searching still ranks with selected fields."""
+        res = self.client.get(RECIPES_URL, {'search': 'kale', 'fields': 'id'})
+
+        self.assertEqual(res.json(), [{'id': self.recipe.id}])
+
+    def test_detail_fields(self):
+        """Test details can select fields, including detail only ones."""
+        res, queries = self.get(
+            detail_url(self.recipe.id), {'fields': 'description,image'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'description': 'Hot.', 'image': None})
+        self.assertNotIn('image_renditions', queries[-1])
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown fields are reported."""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,user,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.json(), {'fields': 'Unknown fields: secret, user.'})
+
+        res = self.client.get(RECIPES_URL, {'omit': 'description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('omit', res.json())
+
+    def test_no_fields_left_rejected(self):
+        """Test omitting every requested field is refused."""
+        res = self.client.get(RECIPES_URL, {'fields': 'id', 'omit': 'id'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_schema_documents_parameters(self):
+        """Test the parameters are in the API schema."""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+
+        paths = res.json()['paths']
+        for path, method in [('/api/recipe/recipes/', 'get'),
+                             ('/api/recipe/recipes/{id}/', 'get')]:
+            names = {
+                parameter['name']
+                for parameter in paths[path][method]['parameters']
+            }
+            self.assertLessEqual({'fields', 'omit'}, names)
@@ -83,6 +83,17 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to a name the user already has fails."""
+        Tag.objects.create(user=self.user, name='Lunch')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Lunch'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Dinner')
+
     def test_delete_tag(self):
         """Test deleting tags."""
         tag = Tag.objects.create(user=self.user, name='Tag to be deleted')
@@ -134,3 +145,48 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_tags_cursor_pagination(self):
+        """Test paginating tags by name, then id."""
+        for name in ['Breakfast', 'Lunch', 'Dinner']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Lunch', 'Dinner'])
+
+        res = self.client.get(res.data['next'])
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Breakfast'])
+        self.assertIsNone(res.data['next'])
+
+    def test_tags_ordered_by_popularity(self):
+        """Test ordering tags by number of recipes, also when paginated."""
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ['Breakfast', 'Lunch', 'Dinner']]
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('5.00'),
+                user=self.user,
+            )
+            recipe.tags.add(*tags[i:])
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+        names = [tag['name'] for tag in res.data]
+        self.assertEqual(names, ['Dinner', 'Lunch', 'Breakfast'])
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular',
+                                         'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names += [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Dinner', 'Lunch', 'Breakfast'])
+
+    def test_tags_invalid_ordering(self):
+        """Test an unknown ordering returns bad request."""
+        res = self.client.get(TAGS_URL, {'ordering': 'newest'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,10 @@
 """
 Views for the recipe API.
 """
+from itertools import islice
+import csv
+import json
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -8,27 +12,68 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.encoders import JSONEncoder
 
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
+from core.async_views import AsyncReadMixin
+from core.replicas import ReplicaReadMixin
 from recipe import serializers
+from recipe.cache import cache_per_user
+from recipe.conditional import (
+    conditional_get,
+    user_recipes_version,
+    recipe_version,
+)
+from recipe.parsers import JSONArrayStreamParser, NDJSONParser
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
+
+
+class _Echo:
+    """File-like object returning what is written, for streaming CSV."""
+
+    def write(self, value):
+        return value
+
+
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to return, '
+                    'e.g. id,title. Defaults to all of them.',
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields not to return.',
+    ),
+]
 
 
 @extend_schema_view(
     list=extend_schema(
         parameters=[
+            *SPARSE_FIELDSET_PARAMETERS,
             OpenApiParameter(
                 'tags',
                 OpenApiTypes.STR,
@@ -39,10 +84,23 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Return recipes matching any (default) or all '
+                            'of the given tags and ingredients.',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full text search over titles, descriptions '
+                            'and ingredient names, best matches first.',
+            ),
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDSET_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncReadMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     """
     Explanation notes:
@@ -56,8 +114,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.RecipeDetailSerializer
     # The queryset represent the objects that are available for this viewset.
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    # Read-only fast paths of the serializers, by action. They render
+    # values() rows and fetch the tags and ingredients of all the recipes
+    # together, so that any number of recipes costs a fixed number of
+    # queries.
+    row_serializer_classes = {
+        'list': serializers.RecipeRowSerializer,
+        'retrieve': serializers.RecipeDetailRowSerializer,
+    }
+    # Number of rows validated and inserted together by the bulk import.
+    bulk_chunk_size = 500
+    # Number of recipes read and serialized together by the export.
+    export_chunk_size = 500
+    export_content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
 
     def _params_to_int(self, qs):
         """Convert a list of strings to integers"""
@@ -70,16 +144,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         by the user that is assigned to the request."""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Must be "any" or "all".'})
+
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.with_tags(tag_ids, match)
         if ingredients:
             ingredient_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = queryset.with_ingredients(ingredient_ids, match)
 
-        return queryset.filter(user=self.request.user)\
-            .order_by('-id').distinct()
+        ordering = ('-id',)
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = queryset.search(search)
+            ordering = ('-rank', '-id')
+
+        return queryset.for_user(self.request.user).order_by(*ordering)
 
     def get_serializer_class(self):
         """Return the serializer class for the request."""
@@ -90,19 +173,198 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def get_requested_fields(self):
+        """Return the fields selected by the `fields` and `omit` query
+        parameters, or None for all of them."""
+        fields = self.request.query_params.get('fields')
+        omit = self.request.query_params.get('omit')
+        if not fields and not omit:
+            return None
+
+        available = self.row_serializer_classes[self.action].fields
+        selected = {}
+        for param, value in [('fields', fields), ('omit', omit)]:
+            names = [name.strip() for name in (value or '').split(',')]
+            selected[param] = {name for name in names if name}
+            unknown = selected[param] - set(available)
+            if unknown:
+                raise ValidationError({
+                    param: f'Unknown fields: {", ".join(sorted(unknown))}.'
+                })
+
+        requested = [
+            field for field in available
+            if (not fields or field in selected['fields'])
+            and field not in selected['omit']
+        ]
+        if not requested:
+            raise ValidationError({'fields': 'No fields left to return.'})
+        return requested
+
+    def get_rows(self):
+        """Return the rows of the recipes, for the fast path serializer,
+        with only the columns of the requested fields."""
+        serializer_class = self.row_serializer_classes[self.action]
+        return serializer_class.rows(
+            self.filter_queryset(self.get_queryset()),
+            self.get_requested_fields(),
+        )
+
+    def get_row_serializer(self, *args, **kwargs):
+        """Return the fast path serializer of the action, rendering the
+        requested fields."""
+        serializer_class = self.row_serializer_classes[self.action]
+        kwargs.setdefault('context', self.get_serializer_context())
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return serializer_class(*args, **kwargs)
+
+    @conditional_get(user_recipes_version)
+    @cache_per_user
+    def list(self, request, *args, **kwargs):
+        rows = self.get_rows()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            serializer = self.get_row_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_row_serializer(rows, many=True)
+        return Response(serializer.data)
+
+    @conditional_get(recipe_version)
+    @cache_per_user
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(
+            self.get_rows(), pk=kwargs[self.lookup_field])
+        self.check_object_permissions(request, row)
+
+        return Response(self.get_row_serializer(row).data)
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    def _import_rows(self, rows):
+        """Validate and create a chunk of imported rows.
+
+        Returns the number of recipes created and the errors of the rows
+        that could not be imported, keyed by row number."""
+        serializer = self.get_serializer(many=True)
+        validated, errors = [], []
+        for row_number, row in rows:
+            if isinstance(row, ParseError):
+                errors.append({'row': row_number, 'errors': row.detail})
+                continue
+            try:
+                item = serializer.child.run_validation(row)
+            except ValidationError as exc:
+                errors.append({'row': row_number, 'errors': exc.detail})
+                continue
+            validated.append({**item, 'user': self.request.user})
+
+        if validated:
+            serializer.create(validated)
+        return len(validated), errors
+
+    def _export_ndjson(self, chunks):
+        """Yield one JSON document per recipe."""
+        for chunk in chunks:
+            data = self.get_serializer(chunk, many=True).data
+            yield ''.join(
+                json.dumps(item, cls=JSONEncoder) + '\n' for item in data)
+
+    def _csv_value(self, field, value):
+        """Flatten a serialized value into a CSV cell."""
+        if field in ('tags', 'ingredients'):
+            return ';'.join(obj['name'] for obj in value)
+        if isinstance(value, dict):
+            return json.dumps(value)
+        return value
+
+    def _export_csv(self, chunks):
+        """Yield CSV rows, tags and ingredients as ';' separated names."""
+        writer = csv.writer(_Echo())
+        fields = self.get_serializer().Meta.fields
+        yield writer.writerow(fields)
+        for chunk in chunks:
+            for item in self.get_serializer(chunk, many=True).data:
+                yield writer.writerow([
+                    self._csv_value(field, item[field]) for field in fields
+                ])
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR, enum=['ndjson', 'csv'],
+                description='Format of the export (default ndjson).',
+            ),
+        ],
+        responses={200: OpenApiTypes.STR},
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all the user's recipes, with their tags and ingredients.
+
+        Recipes are read through a server-side cursor and serialized one
+        chunk at a time, so memory use does not depend on the number of
+        recipes."""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in self.export_content_types:
+            raise ValidationError(
+                {'export_format': 'Must be "ndjson" or "csv".'})
+
+        chunks = self.get_queryset()\
+            .chunks_with_tags_and_ingredients(self.export_chunk_size)
+        if export_format == 'csv':
+            content = self._export_csv(chunks)
+        else:
+            content = self._export_ndjson(chunks)
+
+        response = StreamingHttpResponse(
+            content,
+            content_type=self.export_content_types[export_format],
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_format}"'
+        return response
+
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True),
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='bulk',
+        parser_classes=[JSONArrayStreamParser, NDJSONParser],
+    )
+    def bulk(self, request):
+        """Import many recipes from a JSON array or NDJSON body.
+
+        The body is parsed while it is read and imported in chunks, each
+        in its own transaction. Rows that fail validation are skipped and
+        reported by row number (starting at 1)."""
+        created, errors = 0, []
+        rows = enumerate(request.data, start=1)
+        while True:
+            chunk = list(islice(rows, self.bulk_chunk_size))
+            if not chunk:
+                break
+            chunk_created, chunk_errors = self._import_rows(chunk)
+            created += chunk_created
+            errors.extend(chunk_errors)
+
+        return Response({'created': created, 'errors': errors})
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload image to recipe."""
+        """Upload image to recipe. It is processed in the background."""
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -115,17 +377,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.',
             ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=['name', 'popular'],
+                description='Order by name (default) or by number of '
+                            'recipes, most used first.',
+            ),
+            OpenApiParameter(
+                'prefix',
+                OpenApiTypes.STR,
+                description='Autocomplete: names starting with this text, '
+                            'most used first.',
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Autocomplete: names containing or resembling '
+                            'this text, best matches first.',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Number of autocomplete matches (default 10).',
+            ),
         ]
     )
 )
 class BasicRecipeAttrViewSet(
+                            AsyncReadMixin,
+                            ReplicaReadMixin,
                             mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for recipe attributes."""
-    authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+    autocomplete_limit = 10
+    autocomplete_max_limit = 50
+    orderings = {
+        'name': ('-name', 'id'),
+        'popular': ('-recipe_count', 'id'),
+    }
+
+    def _autocomplete_params(self):
+        """Return the autocomplete text and whether it is a prefix, or
+        (None, False) when not autocompleting."""
+        prefix = self.request.query_params.get('prefix')
+        if prefix:
+            return prefix, True
+        return self.request.query_params.get('q') or None, False
+
+    def _autocomplete_limit(self):
+        """Return the number of autocomplete matches requested."""
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return self.autocomplete_limit
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.autocomplete_max_limit:
+            raise ValidationError({'limit': (
+                'Must be a number from 1 to '
+                f'{self.autocomplete_max_limit}.'
+            )})
+        return limit
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
@@ -134,13 +451,41 @@ class BasicRecipeAttrViewSet(
             # called: assigned_only.
             int(self.request.query_params.get('assigned_only', 0))
         )
+        ordering = self.request.query_params.get('ordering', 'name')
+        if ordering not in self.orderings:
+            raise ValidationError({'ordering': (
+                'Must be one of: ' + ', '.join(self.orderings) + '.'
+            )})
         # Adding the original queryset to the queryset variable.
         queryset = self.queryset
         if assigned_only:
-            # Filtering on tags and ingredients that are assigned to a recipe.
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user)\
-            .order_by('-name').distinct()
+            # Filtering on tags and ingredients that are assigned to a
+            # recipe, using their maintained recipe count.
+            queryset = queryset.filter(recipe_count__gt=0)
+        queryset = queryset.filter(user=self.request.user)
+
+        text, prefix = self._autocomplete_params()
+        if text:
+            return queryset.autocomplete(text, prefix=prefix)
+        return queryset.order_by(*self.orderings[ordering])
+
+    @cache_per_user
+    def list(self, request, *args, **kwargs):
+        text, _ = self._autocomplete_params()
+        if text:
+            # Only the top matches are returned, so no pagination.
+            queryset = self.get_queryset()[:self._autocomplete_limit()]
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        return super().list(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        """Update the item, rejecting names the user already has."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': 'This name is already in use.'})
 
 
 class TagViewSet(BasicRecipeAttrViewSet):
@@ -0,0 +1,120 @@
+"""
+Authentication for the API.
+
+CachedTokenAuthentication is a drop-in replacement for DRF's
+TokenAuthentication that remembers which user a token belongs to,
+instead of querying the token and user tables on every request. Only the
+user's id and permission flags are cached: request.user is a User whose
+other fields are deferred, read from the database if used, so they are
+never stale. Entries live in a bounded in-process LRU for
+AUTH_TOKEN_CACHE_TTL seconds and, when AUTH_TOKEN_CACHE_ALIAS names a
+Django cache, in that shared cache too.
+
+Deleting a token, or saving its user, removes its entry from the LRU of
+the process making the change and, with a shared cache, bumps the
+version of the token there. Every process checks that version on each
+request and drops entries of another version, so the change applies
+everywhere at once. Without a shared cache, other processes drop their
+entry when the TTL expires.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import LRUCache
+
+
+token_cache = LRUCache(
+    max_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL,
+)
+
+
+def _shared_cache():
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    return f'auth:token:{key}'
+
+
+def _version_key(key):
+    return f'auth:token:{key}:version'
+
+
+def invalidate_token(key):
+    """Forget the cached user of a token, in every process sharing the
+    cache."""
+    token_cache.delete(key)
+    shared_cache = _shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(_shared_key(key))
+        # Entries of other processes were stored with the old version. A
+        # version that expired reads as None, which differs from theirs
+        # too, and by then they have expired as well.
+        shared_cache.set(_version_key(key), uuid.uuid4().hex,
+                         settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication with a cached token -> user lookup."""
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        version = None
+        shared_cache = _shared_cache()
+        if shared_cache is not None:
+            keys = [_version_key(key)]
+            if entry is None:
+                keys.append(_shared_key(key))
+            found = shared_cache.get_many(keys)
+            version = found.get(_version_key(key))
+            if entry is None and _shared_key(key) in found:
+                entry = found[_shared_key(key)]
+                if entry['version'] == version:
+                    token_cache.set(key, entry)
+            if entry is not None and entry['version'] != version:
+                entry = None
+
+        if entry is None:
+            # Raises AuthenticationFailed for unknown tokens and inactive
+            # users, which are therefore never cached. The version was
+            # read first, so a change saved meanwhile is not hidden.
+            user, token = super().authenticate_credentials(key)
+            entry = {
+                'user_id': user.pk,
+                'is_staff': user.is_staff,
+                'is_superuser': user.is_superuser,
+                'version': version,
+            }
+            token_cache.set(key, entry)
+            if shared_cache is not None:
+                shared_cache.set(
+                    _shared_key(key), entry, settings.AUTH_TOKEN_CACHE_TTL)
+            return user, token
+
+        user = self._user(entry)
+        return user, Token(key=key, user=user)
+
+    def _user(self, entry):
+        """Return a user with the fields of an entry, the others
+        deferred."""
+        values = {
+            'id': entry['user_id'],
+            'is_active': True,
+            'is_staff': entry['is_staff'],
+            'is_superuser': entry['is_superuser'],
+        }
+        names = [
+            field.attname
+            for field in get_user_model()._meta.concrete_fields
+            if field.attname in values
+        ]
+        return get_user_model().from_db(
+            None, names, [values[name] for name in names])
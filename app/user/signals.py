@@ -0,0 +1,37 @@
+"""
+Signal handlers for the user API.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Forget a token when it is deleted."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, update_fields=None,
+                           **kwargs):
+    """Forget a user's tokens when the cached flags of the user may have
+    changed, or their password."""
+    if created or update_fields is not None and not {
+        'is_active', 'is_staff', 'is_superuser', 'password',
+    } & set(update_fields):
+        return
+
+    for key in Token.objects.filter(user_id=instance.pk)\
+            .values_list('key', flat=True):
+        invalidate_token(key)
+        # Again once committed, in case a request read the user between
+        # the first time and the commit.
+        transaction.on_commit(partial(invalidate_token, key))
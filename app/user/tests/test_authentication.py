@@ -0,0 +1,166 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens."""
+
+    def setUp(self) -> None:
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        """Test the token is only looked up on the first request."""
+        # The token and user, then the user again, by the view.
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_only_ids_and_flags_cached(self):
+        """Test the cached user has its other fields read when used."""
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(ME_URL)
+
+        user, token = CachedTokenAuthentication()\
+            .authenticate_credentials(self.token.key)
+
+        self.assertEqual(token.key, self.token.key)
+        self.assertEqual((user.pk, user.is_active, user.is_staff),
+                         (self.user.pk, True, True))
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='New Name')
+        with self.assertNumQueries(1):
+            self.assertEqual(user.name, 'New Name')
+
+    def test_profile_not_stale(self):
+        """Test the profile is read from the database, not the cache."""
+        self.client.get(ME_URL)
+        # As saved by another process.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='New Name')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops working right away."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user is rejected right away."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """Test changing the password through the API re-reads the user."""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'password': 'newpassword123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(2):
+            self.client.get(ME_URL)
+
+
+@override_settings(CACHES=SHARED_CACHES, AUTH_TOKEN_CACHE_ALIAS='auth')
+class SharedTokenCacheTests(TestCase):
+    """Test changes to users apply to the entries of every process."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_entry_shared(self):
+        """Test an entry cached by a process is used by the others."""
+        self.client.get(TAGS_URL)
+        # As in another process, with an LRU of its own.
+        token_cache.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_rejected_everywhere(self):
+        """Test deactivating a user rejects the entries of other
+        processes right away."""
+        self.client.get(TAGS_URL)
+        entry = token_cache.get(self.token.key)
+
+        self.user.is_active = False
+        self.user.save()
+        # Another process still has the entry in its LRU.
+        token_cache.set(self.token.key, entry)
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_flag_change_applies(self):
+        """Test permission changes are not hidden by cached entries."""
+        self.client.get(TAGS_URL)
+        entry = token_cache.get(self.token.key)
+
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        token_cache.set(self.token.key, entry)
+        user, _ = CachedTokenAuthentication()\
+            .authenticate_credentials(self.token.key)
+
+        self.assertTrue(user.is_staff)
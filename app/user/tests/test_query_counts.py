@@ -0,0 +1,80 @@
+"""
+Test the queries of the user APIs against the query baseline.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.testing import QueryBaselineMixin
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class UserQueryCountTests(QueryBaselineMixin, TestCase):
+    """Test the queries of the user endpoints."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', name='Test Name')
+        self.client = APIClient()
+
+    def test_create_user(self):
+        """Test the queries of creating a user."""
+        payload = {
+            'email': 'new@example.com',
+            'password': 'testpass123',
+            'name': 'New Name',
+        }
+
+        res = self.assertQueriesMatchBaseline(
+            'user-create',
+            lambda: self.client.post(CREATE_USER_URL, payload))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_token(self):
+        """Test the queries of creating a token."""
+        payload = {'email': 'user@example.com', 'password': 'testpass123'}
+
+        res = self.assertQueriesMatchBaseline(
+            'user-token', lambda: self.client.post(TOKEN_URL, payload))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_profile(self):
+        """Test the queries of retrieving the profile."""
+        self.client.force_authenticate(self.user)
+
+        res = self.assertQueriesMatchBaseline(
+            'user-me', lambda: self.client.get(ME_URL))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_profile(self):
+        """Test the queries of updating the profile."""
+        self.client.force_authenticate(self.user)
+
+        res = self.assertQueriesMatchBaseline(
+            'user-me-update',
+            lambda: self.client.patch(ME_URL, {'name': 'Updated'}))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_replace_profile(self):
+        """Test the queries of replacing the profile."""
+        self.client.force_authenticate(self.user)
+        payload = {
+            'email': 'user@example.com',
+            'password': 'newpass123',
+            'name': 'Updated',
+        }
+
+        res = self.assertQueriesMatchBaseline(
+            'user-me-put', lambda: self.client.put(ME_URL, payload))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
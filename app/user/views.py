@@ -2,10 +2,14 @@
 Views for the user API. It first runs it through the view,
 and then through the serializer functions.
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.replicas import ReplicaReadMixin
+
 # Create your views here.
 from user.serializers import (
     UserSerializer,
@@ -24,12 +28,12 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     """Manages the Authenticated user, with GET, PUT and PATCH requests."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return the authenticated user."""
-        return self.request.user
+        """Retrieve and return the authenticated user, from the database
+        rather than as cached by the authentication."""
+        return get_user_model().objects.get(pk=self.request.user.pk)
@@ -0,0 +1,26 @@
+server {
+    listen ${LISTEN_PORT};
+
+    location /static {
+        alias /vol/static;
+    }
+
+    # Uploaded images are named after the hash of their content, so a URL
+    # never changes meaning and browsers need not revalidate it.
+    location /static/media/uploads/ {
+        alias /vol/static/media/uploads/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        etag off;
+        access_log off;
+    }
+
+    # The app served over HTTP by uvicorn (SERVER=asgi).
+    location / {
+        proxy_pass              http://${APP_HOST}:${APP_PORT};
+        proxy_http_version      1.1;
+        proxy_set_header        Host $host;
+        proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header        X-Forwarded-Proto $scheme;
+        client_max_body_size    10M;
+    }
+}
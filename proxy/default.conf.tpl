@@ -5,9 +5,18 @@ server {
         alias /vol/static;
     }
 
+    # Uploaded images are named after the hash of their content, so a URL
+    # never changes meaning and browsers need not revalidate it.
+    location /static/media/uploads/ {
+        alias /vol/static/media/uploads/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        etag off;
+        access_log off;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
         client_max_body_size    10M;
     }
-}
\ No newline at end of file
+}
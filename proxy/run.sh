@@ -2,5 +2,12 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
-nginx -g 'daemon off;'
\ No newline at end of file
+TEMPLATE=/etc/nginx/default.conf.tpl
+if [ "$SERVER" = "asgi" ]; then
+    TEMPLATE=/etc/nginx/default-asgi.conf.tpl
+fi
+
+# Only our variables, nginx ones like $host are left as they are.
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT}' \
+    < $TEMPLATE > /etc/nginx/conf.d/default.conf
+nginx -g 'daemon off;'
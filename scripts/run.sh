@@ -6,4 +6,10 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+if [ "$SERVER" = "asgi" ]; then
+    uvicorn app.asgi:application --host 0.0.0.0 \
+        --port 9000 --workers 4
+else
+    uwsgi --socket :9000 --workers 4 --master --enable-threads --lazy-apps \
+        --module app.wsgi
+fi